@@ -1,4 +1,6 @@
 import asyncio
+import logging
+import multiprocessing
 import sys
 
 from PySide6.QtWidgets import QApplication
@@ -8,6 +10,11 @@ from qasync import QEventLoop
 from app import Window
 
 if __name__ == '__main__':
+    # Export stages run image work in worker processes.
+    multiprocessing.freeze_support()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     QApplication.setHighDpiScaleFactorRoundingPolicy(Qt.HighDpiScaleFactorRoundingPolicy.PassThrough)
 
     app = QApplication(sys.argv)
@@ -0,0 +1,10 @@
+import multiprocessing
+import sys
+
+from app.cli import main
+
+if __name__ == '__main__':
+    # Stories are exported in worker processes.
+    multiprocessing.freeze_support()
+
+    sys.exit(main())
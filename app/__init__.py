@@ -1 +1,6 @@
-from .window import Window
\ No newline at end of file
+def __getattr__(name):
+    # Imported on first use, so headless entry points (app.cli) can use the export engine without loading Qt.
+    if name == 'Window':
+        from .window import Window
+        return Window
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,212 @@
+"""
+Headless entry point: builds and exports stories without Qt.
+
+    python MySekaiStorywriterCLI.py export a.sekai-story.json b.sekai-story.json --out-dir build --jobs 4
+    python MySekaiStorywriterCLI.py batch episodes/*.sekai-story.json --out-dir build
+    python MySekaiStorywriterCLI.py verify build/*/*.sekai-story.json --report report.json
+
+``export`` exports stories in parallel processes. All of them use the caches under ``./cache`` (content store,
+derived images), so run every process from the same working directory to share them. ``batch`` exports the stories
+one after another in one process with BatchExporter, through one content store, so files the stories have in common
+are hashed and stored once.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app.export import StoryExporter, BatchExporter, ExportOptions, verify_export, format_bytes, format_duration
+from app.story_io import load_story
+
+STORY_SUFFIX = '.sekai-story.json'
+PACKAGE_SUFFIX = '.sekai-story.zip'
+
+
+def story_stem(path: str) -> str:
+    name = os.path.basename(path)
+    for suffix in (STORY_SUFFIX, PACKAGE_SUFFIX, '.json', '.zip'):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def output_path(input_path: str, out_dir: str, package: bool) -> str:
+    stem = story_stem(input_path)
+    return os.path.join(out_dir, stem, stem + (PACKAGE_SUFFIX if package else STORY_SUFFIX))
+
+
+class StagePrinter:
+    """Progress callback that prints one line per export stage."""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.stage = None
+
+    def __call__(self, progress: dict) -> None:
+        if progress['stage'] != self.stage:
+            self.stage = progress['stage']
+            print(f'[{self.label}] {self.stage}', flush=True)
+
+
+def export_story(input_path: str, output: str, options: dict) -> dict:
+    """Loads and exports one story; runs in a worker process, so everything in and out is plain data."""
+    started = time.monotonic()
+    story = load_story(input_path)
+    snippets = [snippet.build() for snippet in story['snippets']]
+    exporter = StoryExporter(output, story['models'], story['images'], snippets,
+                             StagePrinter(story_stem(input_path)), ExportOptions.from_dict(options))
+    exporter.run()
+    return {
+        'input': input_path,
+        'output': output,
+        'files': len(exporter.targets),
+        'bytes': exporter.progress.bytes_done,
+        'seconds': time.monotonic() - started,
+    }
+
+
+def build_options(args: argparse.Namespace) -> ExportOptions:
+    options = ExportOptions.load(args.options) if args.options else ExportOptions()
+    for flag, field in (('package', 'package'), ('asset_store', 'use_asset_store'),
+                        ('optimize_images', 'optimize_images'), ('optimize_textures', 'optimize_textures')):
+        if getattr(args, flag):
+            setattr(options, field, True)
+    if args.texture_max_size is not None:
+        options.texture_max_size = args.texture_max_size
+    return options
+
+
+def run_export(args: argparse.Namespace) -> int:
+    options = build_options(args)
+    if args.output:
+        jobs = [(args.inputs[0], args.output)]
+    else:
+        jobs = [(path, output_path(path, args.out_dir, options.package)) for path in args.inputs]
+
+    started = time.monotonic()
+    results = []
+    failures = 0
+    workers = max(1, min(args.jobs or os.cpu_count() or 1, len(jobs)))
+
+    if workers == 1:
+        for input_path, output in jobs:
+            try:
+                results.append(export_story(input_path, output, options.to_dict()))
+            except Exception:
+                traceback.print_exc()
+                print(f'Failed: {input_path}', file=sys.stderr)
+                failures += 1
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(export_story, input_path, output, options.to_dict()): input_path
+                for input_path, output in jobs
+            }
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f'Failed: {futures[future]}: {e}', file=sys.stderr)
+                    failures += 1
+
+    for result in results:
+        print(f"{result['input']} -> {result['output']}: {result['files']} files, "
+              f"{format_bytes(result['bytes'])} written, {format_duration(result['seconds'])}")
+    print(f'Exported {len(results)} of {len(jobs)} stories in {format_duration(time.monotonic() - started)}')
+    return 1 if failures else 0
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    options = build_options(args)
+    started = time.monotonic()
+
+    stories = []
+    load_seconds = {}
+    for input_path in args.inputs:
+        load_started = time.monotonic()
+        output = output_path(input_path, args.out_dir, options.package)
+        stories.append((output, load_story(input_path)))
+        load_seconds[output] = time.monotonic() - load_started
+
+    report = BatchExporter(stories, options, StagePrinter('batch')).run()
+
+    for entry in report['stories']:
+        seconds = load_seconds[entry['output']] + entry['resolve_seconds'] + entry['write_seconds']
+        status = f"failed: {entry['error']}" if entry['error'] else f"{entry['files']} files"
+        print(f"{entry['output']}: {status}, {format_duration(seconds)} "
+              f"(load {load_seconds[entry['output']]:.2f}s, resolve {entry['resolve_seconds']:.2f}s, "
+              f"write {entry['write_seconds']:.2f}s)")
+
+    failures = sum(1 for entry in report['stories'] if entry['error'])
+    print(f'Exported {len(stories) - failures} of {len(stories)} stories in '
+          f'{format_duration(time.monotonic() - started)}')
+    return 1 if failures else 0
+
+
+def run_verify(args: argparse.Namespace) -> int:
+    reports = [verify_export(path, args.workers) for path in args.inputs]
+    report = {'ok': all(r['ok'] for r in reports), 'stories': reports}
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        for r in reports:
+            status = 'OK' if r['ok'] else f"{len(r['errors'])} problems"
+            print(f"{r['story']}: {status}, {r['files']} files checked")
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0 if report['ok'] else 1
+
+
+def add_option_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--options', help='export options JSON, as saved by the editor')
+    parser.add_argument('--package', action='store_true', help='write .sekai-story.zip packages')
+    parser.add_argument('--asset-store', action='store_true', help='materialize files from the shared store')
+    parser.add_argument('--optimize-images', action='store_true', help='resize and re-encode backgrounds')
+    parser.add_argument('--optimize-textures', action='store_true', help='recompress model textures')
+    parser.add_argument('--texture-max-size', type=int, help='halve textures until they fit this size')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='MySekaiStorywriterCLI', description='Build and export stories headless.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='Export stories into folders or packages.')
+    export.add_argument('inputs', nargs='+', help='.sekai-story.json files to export')
+    destination = export.add_mutually_exclusive_group(required=True)
+    destination.add_argument('-o', '--output', help='output file, only with a single input')
+    destination.add_argument('--out-dir', help='export every story into <out-dir>/<story name>/')
+    add_option_arguments(export)
+    export.add_argument('-j', '--jobs', type=int, help='stories exported in parallel (default: CPU count)')
+    export.set_defaults(handler=run_export)
+
+    batch = commands.add_parser('batch', help='Export stories in one process through one content store.')
+    batch.add_argument('inputs', nargs='+', help='.sekai-story.json files to export')
+    batch.add_argument('--out-dir', required=True, help='export every story into <out-dir>/<story name>/')
+    add_option_arguments(batch)
+    batch.set_defaults(handler=run_batch)
+
+    verify = commands.add_parser('verify', help='Check exported stories for missing or corrupted files.')
+    verify.add_argument('inputs', nargs='+', help='exported .sekai-story.json files or .sekai-story.zip packages')
+    verify.add_argument('--report', help='write the JSON report to this file instead of stdout')
+    verify.add_argument('--workers', type=int, default=8, help='files checked in parallel')
+    verify.set_defaults(handler=run_verify)
+    return parser
+
+
+def main(argv: list[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # Export diagnostics go to stderr, so stdout carries only the results.
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s: %(message)s')
+    if getattr(args, 'output', None) and len(args.inputs) > 1:
+        parser.error('--output takes a single input, use --out-dir for several')
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
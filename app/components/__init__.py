@@ -7,3 +7,10 @@ from ._snippet_properties_widget import SnippetPropertiesWidget
 from ._snippet_property_input_widget import SnippetPropertyInputWidget
 from ._voice_property import VoiceProperty
 from ._collapsible_property_card import CollapsiblePropertyCard
+from ._export_options_message_box import ExportOptionsMessageBox
+from ._fuzzy_completer import FuzzyCompleter, FuzzyFilterProxyModel
+from ._snippet_list_model import SnippetListModel
+from ._snippet_search_panel import SnippetSearchPanel
+from ._find_replace_message_box import FindReplaceMessageBox
+from ._undo_commands import RecordedCommand, CallbackCommand, SetPropertiesCommand, SetModelPropertyCommand, \
+    ListItemCommand, InsertSnippetsCommand, RemoveSnippetsCommand, MoveSnippetsCommand
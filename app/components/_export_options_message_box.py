@@ -0,0 +1,94 @@
+from PySide6.QtWidgets import QGridLayout, QWidget
+from qfluentwidgets import SubtitleLabel, MessageBoxBase, SwitchButton, BodyLabel, ComboBox, SpinBox
+
+from app.export import ExportOptions
+
+TEXTURE_SIZES = ['Original', '4096', '2048', '1024', '512']
+
+
+class ExportOptionsMessageBox(MessageBoxBase):
+    def __init__(self, options: ExportOptions, parent=None):
+        super().__init__(parent)
+        self.options = options
+
+        title_label = SubtitleLabel(text='Export Options')
+
+        self.options_layout = QGridLayout()
+        self.options_layout.setContentsMargins(0, 10, 0, 10)
+        self.options_layout.setVerticalSpacing(8)
+
+        self.package_switch = self._add_switch('Export as a single package (.zip)', options.package)
+
+        self.asset_store_switch = self._add_switch(
+            'Share assets between stories (hardlinks)',
+            options.use_asset_store
+        )
+
+        self.optimize_images_switch = self._add_switch('Optimize images', options.optimize_images)
+
+        self.image_format_combo_box = ComboBox()
+        self.image_format_combo_box.addItems(['webp', 'jpeg', 'png'])
+        self.image_format_combo_box.setCurrentText(options.image_format)
+        self._add_row('Image format', self.image_format_combo_box)
+
+        self.image_max_width_edit = self._add_spin_box('Max image width', options.image_max_width, 64, 16384)
+        self.image_max_height_edit = self._add_spin_box('Max image height', options.image_max_height, 64, 16384)
+        self.image_quality_edit = self._add_spin_box('Image quality', options.image_quality, 1, 100)
+
+        self.optimize_textures_switch = self._add_switch('Recompress model textures', options.optimize_textures)
+
+        self.texture_max_size_combo_box = ComboBox()
+        self.texture_max_size_combo_box.addItems(TEXTURE_SIZES)
+        self.texture_max_size_combo_box.setCurrentText(
+            str(options.texture_max_size) if options.texture_max_size else TEXTURE_SIZES[0]
+        )
+        self._add_row('Max texture size', self.texture_max_size_combo_box)
+
+        self.optimize_images_switch.checkedChanged.connect(self._update_enabled)
+        self.optimize_textures_switch.checkedChanged.connect(self._update_enabled)
+        self._update_enabled()
+
+        self.viewLayout.addWidget(title_label)
+        self.viewLayout.addLayout(self.options_layout)
+
+        self.widget.setMinimumWidth(420)
+
+    def _add_row(self, text: str, widget: QWidget) -> None:
+        row = self.options_layout.rowCount()
+        self.options_layout.addWidget(BodyLabel(text=text), row, 0)
+        self.options_layout.addWidget(widget, row, 1)
+
+    def _add_switch(self, text: str, checked: bool) -> SwitchButton:
+        switch = SwitchButton()
+        switch.setOnText("On")
+        switch.setOffText("Off")
+        switch.setChecked(checked)
+        self._add_row(text, switch)
+        return switch
+
+    def _add_spin_box(self, text: str, value: int, minimum: int, maximum: int) -> SpinBox:
+        spin_box = SpinBox()
+        spin_box.setRange(minimum, maximum)
+        spin_box.setValue(value)
+        self._add_row(text, spin_box)
+        return spin_box
+
+    def _update_enabled(self) -> None:
+        enabled = self.optimize_images_switch.isChecked()
+        for widget in (self.image_format_combo_box, self.image_max_width_edit, self.image_max_height_edit,
+                       self.image_quality_edit):
+            widget.setEnabled(enabled)
+        self.texture_max_size_combo_box.setEnabled(self.optimize_textures_switch.isChecked())
+
+    def apply(self) -> ExportOptions:
+        self.options.package = self.package_switch.isChecked()
+        self.options.use_asset_store = self.asset_store_switch.isChecked()
+        self.options.optimize_images = self.optimize_images_switch.isChecked()
+        self.options.image_format = self.image_format_combo_box.currentText()
+        self.options.image_max_width = self.image_max_width_edit.value()
+        self.options.image_max_height = self.image_max_height_edit.value()
+        self.options.image_quality = self.image_quality_edit.value()
+        self.options.optimize_textures = self.optimize_textures_switch.isChecked()
+        texture_max_size = self.texture_max_size_combo_box.currentText()
+        self.options.texture_max_size = int(texture_max_size) if texture_max_size != TEXTURE_SIZES[0] else 0
+        return self.options
@@ -0,0 +1,119 @@
+import re
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QGridLayout, QHBoxLayout
+from qfluentwidgets import SubtitleLabel, MessageBoxBase, BodyLabel, CaptionLabel, LineEdit, ComboBox, CheckBox, \
+    ListWidget
+
+from app.snippet_index import SnippetIndex, REPLACE_FIELDS
+from app.snippets import BaseSnippet
+
+MAX_PREVIEW_CHANGES = 500
+
+# Combo box text -> fields searched.
+FIELD_CHOICES = {
+    'Speaker and content': REPLACE_FIELDS,
+    'Speaker': ('speaker',),
+    'Content': ('content',),
+    'Motion': ('motion',),
+    'Facial': ('facial',),
+}
+
+
+class FindReplaceMessageBox(MessageBoxBase):
+    """Previews a story-wide find and replace; after ``exec()`` the changes to apply are in ``changes``."""
+
+    def __init__(self, index: SnippetIndex, snippets: list[BaseSnippet], parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.snippets = snippets
+        self.changes: list[dict] = []
+
+        title_label = SubtitleLabel(text='Find and Replace')
+
+        form_layout = QGridLayout()
+        form_layout.setContentsMargins(0, 10, 0, 0)
+        form_layout.setVerticalSpacing(8)
+
+        self.find_edit = LineEdit()
+        self.find_edit.setPlaceholderText('Text or regular expression')
+        self.replace_edit = LineEdit()
+        self.field_combo_box = ComboBox()
+        self.field_combo_box.addItems(list(FIELD_CHOICES))
+        form_layout.addWidget(BodyLabel(text='Find'), 0, 0)
+        form_layout.addWidget(self.find_edit, 0, 1)
+        form_layout.addWidget(BodyLabel(text='Replace with'), 1, 0)
+        form_layout.addWidget(self.replace_edit, 1, 1)
+        form_layout.addWidget(BodyLabel(text='In'), 2, 0)
+        form_layout.addWidget(self.field_combo_box, 2, 1)
+
+        options_layout = QHBoxLayout()
+        self.regex_check_box = CheckBox('Regular expression')
+        self.case_check_box = CheckBox('Match case')
+        options_layout.addWidget(self.regex_check_box)
+        options_layout.addWidget(self.case_check_box)
+        options_layout.addStretch(1)
+
+        self.count_label = CaptionLabel()
+        self.preview_list = ListWidget()
+        self.preview_list.setUniformItemSizes(True)
+        self.preview_list.setMinimumHeight(240)
+
+        self.viewLayout.addWidget(title_label)
+        self.viewLayout.addLayout(form_layout)
+        self.viewLayout.addLayout(options_layout)
+        self.viewLayout.addWidget(self.count_label)
+        self.viewLayout.addWidget(self.preview_list)
+
+        self.yesButton.setText('Replace all')
+        self.yesButton.setEnabled(False)
+        self.widget.setMinimumWidth(560)
+
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(200)
+        self._preview_timer.timeout.connect(self.preview)
+        self.find_edit.textChanged.connect(self._preview_timer.start)
+        self.replace_edit.textChanged.connect(self._preview_timer.start)
+        self.field_combo_box.currentIndexChanged.connect(self._preview_timer.start)
+        self.regex_check_box.stateChanged.connect(self._preview_timer.start)
+        self.case_check_box.stateChanged.connect(self._preview_timer.start)
+
+    def preview(self) -> None:
+        self.changes = []
+        self.preview_list.clear()
+        find = self.find_edit.text()
+
+        if find:
+            try:
+                self.changes = self.index.find_replacements(
+                    self.snippets, find, self.replace_edit.text(), self.regex_check_box.isChecked(),
+                    self.case_check_box.isChecked(), FIELD_CHOICES[self.field_combo_box.currentText()]
+                )
+            except re.error as e:
+                self.count_label.setText(f'Invalid regular expression: {e}')
+                self.yesButton.setEnabled(False)
+                return
+
+        shown = self.changes[:MAX_PREVIEW_CHANGES]
+        self.preview_list.addItems([
+            f"{change['snippet'].type} #{change['row'] + 1}  {change['old']}  →  {change['new']}".replace('\n', ' ')
+            for change in shown
+        ])
+
+        matches = sum(change['count'] for change in self.changes)
+        if not find:
+            self.count_label.setText('')
+        elif len(shown) < len(self.changes):
+            self.count_label.setText(f'{matches} matches in {len(self.changes)} fields, first {len(shown)} listed')
+        else:
+            self.count_label.setText(f'{matches} matches in {len(self.changes)} fields')
+        self.yesButton.setEnabled(bool(self.changes))
+
+    def validate(self) -> bool:
+        # Edits made within the debounce interval are previewed before anything is replaced.
+        if self._preview_timer.isActive():
+            self._preview_timer.stop()
+            self.preview()
+            return False
+        return bool(self.changes)
@@ -1,6 +1,9 @@
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import QHBoxLayout
-from qfluentwidgets import SubtitleLabel, MessageBoxBase, IndeterminateProgressRing
+from qfluentwidgets import SubtitleLabel, MessageBoxBase, IndeterminateProgressRing, ProgressBar, CaptionLabel, \
+    BodyLabel
+
+from app.export import format_bytes, format_duration
 
 
 class SaveFileMessageBox(MessageBoxBase):
@@ -13,12 +16,45 @@ class SaveFileMessageBox(MessageBoxBase):
         progress_ring_layout.setContentsMargins(0, 20, 0, 20)
         progress_ring_layout.setAlignment(Qt.AlignmentFlag.AlignHCenter)
 
-        progress_ring = IndeterminateProgressRing()
-        progress_ring_layout.addWidget(progress_ring)
+        self.progress_ring = IndeterminateProgressRing()
+        progress_ring_layout.addWidget(self.progress_ring)
+
+        self.stage_label = BodyLabel(text='Preparing...')
+
+        self.progress_bar = ProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setVisible(False)
+
+        self.detail_label = CaptionLabel(text='')
+        self.detail_label.setWordWrap(True)
 
         self.yesButton.setDisabled(True)
 
         self.viewLayout.addWidget(title_label)
         self.viewLayout.addLayout(progress_ring_layout)
+        self.viewLayout.addWidget(self.stage_label)
+        self.viewLayout.addWidget(self.progress_bar)
+        self.viewLayout.addWidget(self.detail_label)
 
         self.widget.setMinimumWidth(350)
+
+    def update_progress(self, progress: dict):
+        stage = progress['stage']
+        self.stage_label.setText(f"{stage}: {progress['current']}" if progress['current'] else stage)
+
+        files_total = progress['files_total']
+        if not files_total:
+            return
+
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(int(progress['files_done'] / files_total * 100))
+
+        details = [
+            f"{progress['files_done']}/{files_total} files",
+            format_bytes(progress['bytes_done']) if not progress['bytes_total']
+            else f"{format_bytes(progress['bytes_done'])}/{format_bytes(progress['bytes_total'])}",
+            f"{format_bytes(progress['throughput'])}/s",
+        ]
+        if progress['eta'] is not None:
+            details.append(f"ETA {format_duration(progress['eta'])}")
+        self.detail_label.setText(' · '.join(details))
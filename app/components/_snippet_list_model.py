@@ -0,0 +1,192 @@
+import json
+from typing import Iterable, Optional
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt, QMimeData, Signal
+
+from app.snippets import BaseSnippet
+
+ROWS_MIME_TYPE = 'application/x-sekai-snippet-rows'
+
+
+def row_ranges(rows: Iterable[int]) -> list[tuple[int, int]]:
+    """Sorted, distinct rows grouped into ``(first row, count)`` runs."""
+    ranges = []
+    for row in sorted(set(rows)):
+        if ranges and ranges[-1][0] + ranges[-1][1] == row:
+            ranges[-1] = (ranges[-1][0], ranges[-1][1] + 1)
+        else:
+            ranges.append((row, 1))
+    return ranges
+
+
+class SnippetListModel(QAbstractListModel):
+    """
+    The story's snippets as a list model. Labels (``Talk #12``) are computed when the view asks for them, so
+    inserting, removing or moving rows only tells the view which rows changed instead of relabelling every item.
+    """
+    SnippetRole = Qt.ItemDataRole.UserRole
+    # Sorted source rows, destination and the block's new first row of a move made by drag and drop.
+    rows_dropped = Signal(list, int, int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._snippets: list[BaseSnippet] = []
+
+    @property
+    def snippets(self) -> list[BaseSnippet]:
+        return self._snippets
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._snippets)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._snippets):
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f'{self._snippets[index.row()].type} #{index.row() + 1}'
+        if role == self.SnippetRole:
+            return self._snippets[index.row()]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            # Rows are dropped between items, never onto one.
+            return Qt.ItemFlag.ItemIsDropEnabled
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsDragEnabled
+
+    def supportedDropActions(self):
+        return Qt.DropAction.MoveAction
+
+    def mimeTypes(self):
+        return [ROWS_MIME_TYPE]
+
+    def mimeData(self, indexes):
+        data = QMimeData()
+        data.setData(ROWS_MIME_TYPE, json.dumps(sorted({index.row() for index in indexes})).encode())
+        return data
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if action != Qt.DropAction.MoveAction or not data.hasFormat(ROWS_MIME_TYPE):
+            return False
+        rows = sorted(set(json.loads(bytes(data.data(ROWS_MIME_TYPE)).decode())))
+        destination = len(self._snippets) if row < 0 else row
+        first = self.move_rows(rows, destination)
+        if first >= 0:
+            self.rows_dropped.emit(rows, destination, first)
+        # The rows are moved here already; reporting the drop as not done keeps the view from removing the sources.
+        return False
+
+    def snippet(self, row: int) -> Optional[BaseSnippet]:
+        return self._snippets[row] if 0 <= row < len(self._snippets) else None
+
+    def _relabel(self, first: int, last: int) -> None:
+        # Row numbers are part of the label, so rows after a structural change read differently.
+        last = min(last, len(self._snippets) - 1)
+        if first <= last:
+            self.dataChanged.emit(self.index(first), self.index(last), [Qt.ItemDataRole.DisplayRole])
+
+    def set_snippets(self, snippets: list[BaseSnippet]) -> None:
+        self.beginResetModel()
+        self._snippets = snippets
+        self.endResetModel()
+
+    def insert_snippets(self, row: int, snippets: list[BaseSnippet]) -> None:
+        if not snippets:
+            return
+        row = max(0, min(row, len(self._snippets)))
+        self.beginInsertRows(QModelIndex(), row, row + len(snippets) - 1)
+        self._snippets[row:row] = snippets
+        self.endInsertRows()
+        self._relabel(row + len(snippets), len(self._snippets) - 1)
+
+    def remove_snippets(self, row: int, count: int) -> list[BaseSnippet]:
+        """Removes ``count`` rows starting at ``row`` and returns their snippets."""
+        count = min(count, len(self._snippets) - row)
+        if row < 0 or count <= 0:
+            return []
+        self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+        removed = self._snippets[row:row + count]
+        del self._snippets[row:row + count]
+        self.endRemoveRows()
+        self._relabel(row, len(self._snippets) - 1)
+        return removed
+
+    def move_snippets(self, row: int, count: int, destination: int) -> bool:
+        """
+        Moves ``count`` rows starting at ``row`` in front of the row ``destination`` (numbered before the move,
+        ``rowCount()`` for the end). Returns ``False`` if that would not move anything.
+        """
+        if count <= 0 or row < 0 or row + count > len(self._snippets) or row <= destination <= row + count \
+                or not 0 <= destination <= len(self._snippets):
+            return False
+        self.beginMoveRows(QModelIndex(), row, row + count - 1, QModelIndex(), destination)
+        block = self._snippets[row:row + count]
+        del self._snippets[row:row + count]
+        insert_at = destination if destination < row else destination - count
+        self._snippets[insert_at:insert_at] = block
+        self.endMoveRows()
+        self._relabel(min(row, insert_at), max(row + count, destination) - 1)
+        return True
+
+    def remove_rows(self, rows: Iterable[int]) -> list[tuple[int, list[BaseSnippet]]]:
+        """Removes any set of rows, one contiguous run at a time, and returns ``(first row, snippets)`` per run."""
+        removed = []
+        for row, count in reversed(row_ranges(row for row in rows if 0 <= row < len(self._snippets))):
+            self.beginRemoveRows(QModelIndex(), row, row + count - 1)
+            removed.append((row, self._snippets[row:row + count]))
+            del self._snippets[row:row + count]
+            self.endRemoveRows()
+        if removed:
+            self._relabel(removed[-1][0], len(self._snippets) - 1)
+        removed.reverse()
+        return removed
+
+    def move_rows(self, rows: Iterable[int], destination: int) -> int:
+        """
+        Moves any set of rows, in their order, as one block in front of the row ``destination`` (numbered before
+        the move). Returns the block's first row after the move, or -1 if there were no rows.
+        """
+        ranges = row_ranges(row for row in rows if 0 <= row < len(self._snippets))
+        if not ranges:
+            return -1
+        destination = max(0, min(destination, len(self._snippets)))
+        moving = [row for first, count in ranges for row in range(first, first + count)]
+        insert_at = destination - sum(1 for row in moving if row < destination)
+
+        if len(ranges) == 1:
+            first, count = ranges[0]
+            self.move_snippets(first, count, destination)
+            return insert_at
+
+        # Scattered rows become one block in a single layout change.
+        self.layoutAboutToBeChanged.emit()
+        moving_set = set(moving)
+        staying = [row for row in range(len(self._snippets)) if row not in moving_set]
+        order = staying[:insert_at] + moving + staying[insert_at:]
+        new_rows = {old_row: new_row for new_row, old_row in enumerate(order)}
+        self._snippets[:] = [self._snippets[old_row] for old_row in order]
+
+        persistent = self.persistentIndexList()
+        self.changePersistentIndexList(persistent, [self.index(new_rows[index.row()]) for index in persistent])
+        self.layoutChanged.emit()
+        return insert_at
+
+    def restore_rows(self, first: int, rows: list[int]) -> None:
+        """Undoes ``move_rows``: sends the block starting at ``first`` back to the sorted ``rows`` it came from."""
+        count = len(rows)
+        if rows[-1] - rows[0] + 1 == count:
+            self.move_snippets(first, count, rows[0] if rows[0] < first else rows[0] + count)
+            return
+
+        self.layoutAboutToBeChanged.emit()
+        block = list(range(first, first + count))
+        order = [row for row in range(len(self._snippets)) if not first <= row < first + count]
+        # Inserting in row order puts every item at its old row, since the rows before it are already in place.
+        for old_row, row in zip(block, rows):
+            order.insert(row, old_row)
+        new_rows = {old_row: new_row for new_row, old_row in enumerate(order)}
+        self._snippets[:] = [self._snippets[old_row] for old_row in order]
+
+        persistent = self.persistentIndexList()
+        self.changePersistentIndexList(persistent, [self.index(new_rows[index.row()]) for index in persistent])
+        self.layoutChanged.emit()
@@ -3,6 +3,7 @@ import json
 from typing import Any
 
 from PySide6.QtCore import Qt, QSize
+from PySide6.QtGui import QUndoStack
 from PySide6.QtWidgets import QSizePolicy, QFileDialog
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QFrame
 from qfluentwidgets import (SpinBox, DoubleSpinBox, LineEdit,
@@ -13,14 +14,16 @@ from qfluentwidgets import StrongBodyLabel, setFont, FluentIcon
 from app.data_model import MetaData
 from app.snippets import BaseSnippet, Curves
 from ._collapsible_property_card import CollapsiblePropertyCard
+from ._fuzzy_completer import FuzzyCompleter
 from ._snippet_property_input_widget import SnippetPropertyInputWidget
+from ._undo_commands import SetPropertiesCommand, ListItemCommand
 from ._voice_property import VoiceProperty
-from ..utils import FuzzyCompleter
 
 
 class SnippetPropertiesWidget(QWidget):
-    def __init__(self, parent=None):
+    def __init__(self, undo_stack: QUndoStack = None, parent=None):
         super().__init__(parent)
+        self.undo_stack = undo_stack
 
         self._main_layout = QVBoxLayout(self)
         self._main_layout.setContentsMargins(0, 0, 0, 0)
@@ -44,9 +47,13 @@ class SnippetPropertiesWidget(QWidget):
         self._main_layout.addWidget(self.scroll_area)
 
         self._current_snippet = None
+        # Other selected snippets of the same type, which property edits are applied to as well.
+        self._linked_snippets: list[BaseSnippet] = []
         self._meta_data: MetaData | None = None
         self._widget_map = {}
         self._expanded_keys = set()
+        # Typing or stepping merges into one undo step until the editor loses focus or the selection changes.
+        self._edit_session = 0
 
         self.clear_properties()
 
@@ -76,9 +83,14 @@ class SnippetPropertiesWidget(QWidget):
         no_snippet_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self._layout.addWidget(no_snippet_label)
 
-    def set_snippet(self, snippet: BaseSnippet, meta_data: MetaData):
+    def set_snippet(self, snippet: BaseSnippet, meta_data: MetaData, linked: list[BaseSnippet] = None):
         self._current_snippet = snippet
+        self._linked_snippets = [
+            other for other in linked or []
+            if snippet is not None and other is not snippet and other.type == snippet.type
+        ]
         self._meta_data = meta_data
+        self._end_edit()
         self._expanded_keys.clear()
         if self._current_snippet:
             self._expanded_keys.add("data")
@@ -86,6 +98,29 @@ class SnippetPropertiesWidget(QWidget):
             self._expanded_keys.add("data.to")
         self._update_properties()
 
+    def _record(self, command) -> None:
+        if self.undo_stack is not None:
+            self.undo_stack.push(command)
+
+    def _begin_macro(self, text: str) -> None:
+        if self.undo_stack is not None:
+            self.undo_stack.beginMacro(text)
+
+    def _end_macro(self) -> None:
+        if self.undo_stack is not None:
+            self.undo_stack.endMacro()
+
+    def _end_edit(self) -> None:
+        self._edit_session += 1
+
+    def _set_property(self, key: str, value, merge: bool = False):
+        changes = []
+        for snippet in (self._current_snippet, *self._linked_snippets):
+            old = snippet.get_property(key)
+            snippet.set_property(key, value)
+            changes.append((snippet, key, old, value))
+        self._record(SetPropertiesCommand(f'Edit {key}', changes, merge, self._update_properties, self._edit_session))
+
     def update_motions(self, widgets: dict[str, Any], model_id: int):
         current_model = None
         if model_id != -1:
@@ -129,19 +164,22 @@ class SnippetPropertiesWidget(QWidget):
             print(f"Failed to load file: {e}")
             return
 
-        for param_name, end_value in data.items():
-            self._current_snippet.add_list_item(key_path)
-            param_list = self._current_snippet.properties
-            for key in key_path.split('.')[:-1]:
-                param_list = param_list[key]
-            last_index = len(param_list[key_path.split('.')[-1]]) - 1
-            param_list[key_path.split('.')[-1]][last_index] = {
-                "paramId": param_name,
-                "start": 0.0,
-                "end": float(end_value),
-                "curve": Curves.Linear,
-                "duration": 0.0
-            }
+        self._begin_macro('Import params')
+        for snippet in (self._current_snippet, *self._linked_snippets):
+            for param_name, end_value in data.items():
+                item = {
+                    "paramId": param_name,
+                    "start": 0.0,
+                    "end": float(end_value),
+                    "curve": Curves.Linear,
+                    "duration": 0.0
+                }
+                items = snippet.get_property(key_path)
+                if not isinstance(items, list):
+                    continue
+                snippet.insert_list_item(key_path, len(items), item)
+                self._record(ListItemCommand(snippet, key_path, len(items) - 1, item, True, self._update_properties))
+        self._end_macro()
 
         self._update_properties()
 
@@ -230,19 +268,22 @@ class SnippetPropertiesWidget(QWidget):
             sub_widget = None
 
             def set_model(model_name: str):
+                # Refilling the motion and facial boxes resets them, which is part of the same undo step.
+                self._begin_macro(f'Edit {full_key}')
                 if model_name != 'None':
                     model_id_result = [model['id'] for model in self._meta_data.models if
                                        model['model_name'] == model_name.split(' #')[0]][0]
-                    self._current_snippet.set_property(full_key, model_id_result)
+                    self._set_property(full_key, model_id_result)
                     self.update_motions(self._widget_map, model_id_result)
                 else:
-                    self._current_snippet.set_property(full_key, -1)
+                    self._set_property(full_key, -1)
                     self.update_motions(self._widget_map, -1)
+                self._end_macro()
 
             def set_image(image_name: str):
                 image_id_result = [image['id'] for image in self._meta_data.images if
                                    image['name'] == image_name.split(' #')[0]][0]
-                self._current_snippet.set_property(full_key, image_id_result)
+                self._set_property(full_key, image_id_result)
 
             def model_property_standard_combo_box() -> tuple[EditableComboBox, dict]:
                 sub_widget_ = EditableComboBox()
@@ -264,7 +305,7 @@ class SnippetPropertiesWidget(QWidget):
                     if _value == "": _value = "None"
                     if _value in motions: sub_widget.setCurrentText(_value)
                 sub_widget.currentTextChanged.connect(
-                    lambda val: self._current_snippet.set_property(full_key, val if val != "None" else "")
+                    lambda val: self._set_property(full_key, val if val != "None" else "", merge=True)
                 )
 
             elif full_key == 'data.facial':
@@ -278,7 +319,7 @@ class SnippetPropertiesWidget(QWidget):
                     if _value == "": _value = "None"
                     if _value in expressions: sub_widget.setCurrentText(_value)
                 sub_widget.currentTextChanged.connect(
-                    lambda val: self._current_snippet.set_property(full_key, val if val != "None" else "")
+                    lambda val: self._set_property(full_key, val if val != "None" else "", merge=True)
                 )
 
             elif _key == 'modelId':
@@ -304,21 +345,21 @@ class SnippetPropertiesWidget(QWidget):
             elif _key == 'voice':
                 sub_widget = VoiceProperty()
                 sub_widget.val = _value
-                sub_widget.text_changed.connect(lambda text: self._current_snippet.set_property(full_key, text))
+                sub_widget.text_changed.connect(lambda text: self._set_property(full_key, text))
 
             elif isinstance(_value, bool):
                 sub_widget = SwitchButton()
                 sub_widget.setChecked(_value)
                 sub_widget.setOnText("On")
                 sub_widget.setOffText("Off")
-                sub_widget.checkedChanged.connect(lambda checked: self._current_snippet.set_property(full_key, checked))
+                sub_widget.checkedChanged.connect(lambda checked: self._set_property(full_key, checked))
 
             elif isinstance(_value, int):
                 sub_widget = SpinBox()
                 sub_widget.setRange(-32767, 32767)
                 sub_widget.setValue(_value)
                 sub_widget.wheelEvent = lambda _: None
-                sub_widget.valueChanged.connect(lambda val: self._current_snippet.set_property(full_key, val))
+                sub_widget.valueChanged.connect(lambda val: self._set_property(full_key, val, merge=True))
 
             elif isinstance(_value, float):
                 sub_widget = DoubleSpinBox()
@@ -327,13 +368,13 @@ class SnippetPropertiesWidget(QWidget):
                 sub_widget.setRange(-32767, 32767)
                 sub_widget.setValue(_value)
                 sub_widget.wheelEvent = lambda _: None
-                sub_widget.valueChanged.connect(lambda val: self._current_snippet.set_property(full_key, val))
+                sub_widget.valueChanged.connect(lambda val: self._set_property(full_key, val, merge=True))
 
             elif isinstance(_value, str):
                 sub_widget = LineEdit()
                 sub_widget.setText(_value)
                 sub_widget.setClearButtonEnabled(True)
-                sub_widget.textChanged.connect(lambda text: self._current_snippet.set_property(full_key, text))
+                sub_widget.textChanged.connect(lambda text: self._set_property(full_key, text, merge=True))
 
             elif isinstance(_value, enum.Enum):
                 sub_widget = ComboBox()
@@ -342,11 +383,13 @@ class SnippetPropertiesWidget(QWidget):
                 sub_widget.addItems(members)
                 sub_widget.setCurrentText(_value.name)
                 sub_widget.currentTextChanged.connect(
-                    lambda val: self._current_snippet.set_property(full_key, enum_class[val])
+                    lambda val: self._set_property(full_key, enum_class[val])
                 )
 
             if sub_widget:
                 sub_widget.setFixedHeight(28)
+                if isinstance(sub_widget, (LineEdit, SpinBox, DoubleSpinBox)):
+                    sub_widget.editingFinished.connect(self._end_edit)
                 if isinstance(sub_widget, (ComboBox, EditableComboBox, LineEdit, SpinBox, DoubleSpinBox)):
                     sub_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
 
@@ -355,6 +398,12 @@ class SnippetPropertiesWidget(QWidget):
                 self._widget_map[full_key] = block
                 layout_to_add.addWidget(block)
 
+        if self._linked_snippets:
+            linked_label = BodyLabel(
+                f'Edits apply to all {len(self._linked_snippets) + 1} selected {self._current_snippet.type} snippets')
+            linked_label.setStyleSheet("color: gray;")
+            self._layout.addWidget(linked_label)
+
         for key, value in self._current_snippet.properties.items():
             create_input_widget(key, value)
 
@@ -362,9 +411,21 @@ class SnippetPropertiesWidget(QWidget):
 
     def _add_list_item(self, key_path):
         self._expanded_keys.add(key_path)
-        self._current_snippet.add_list_item(key_path)
+        self._begin_macro(f"Add {key_path.split('.')[-1]} item")
+        for snippet in (self._current_snippet, *self._linked_snippets):
+            item = snippet.add_list_item(key_path)
+            if item is not None:
+                index = len(snippet.get_property(key_path)) - 1
+                self._record(ListItemCommand(snippet, key_path, index, item, True, self._update_properties))
+        self._end_macro()
         self._update_properties()
 
     def _remove_list_item(self, key_path, index):
-        self._current_snippet.remove_list_item(key_path, index)
+        # Linked snippets lose the item at the same position, if they have one.
+        self._begin_macro(f"Remove {key_path.split('.')[-1]} item")
+        for snippet in (self._current_snippet, *self._linked_snippets):
+            item = snippet.remove_list_item(key_path, index)
+            if item is not None:
+                self._record(ListItemCommand(snippet, key_path, index, item, False, self._update_properties))
+        self._end_macro()
         self._update_properties()
@@ -0,0 +1,125 @@
+from PySide6.QtCore import Qt, QTimer, Signal
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout
+from qfluentwidgets import SearchLineEdit, ComboBox, ListWidget, CaptionLabel, TransparentToolButton, FluentIcon
+
+from app.snippet_index import SnippetIndex, SEARCH_FIELDS
+from app.snippets import SNIPPET_FACTORIES
+from ._snippet_list_model import SnippetListModel
+
+MAX_SHOWN_RESULTS = 2000
+
+
+class SnippetSearchPanel(QWidget):
+    """Searches the snippets of a ``SnippetListModel``; picking a result emits its row."""
+    result_activated = Signal(int)
+
+    def __init__(self, snippet_model: SnippetListModel, index: SnippetIndex, parent=None):
+        super().__init__(parent)
+        self.snippet_model = snippet_model
+        self.index = index
+        self._result_rows: list[int] = []
+        self._position = -1
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(4)
+
+        self.search_edit = SearchLineEdit(self)
+        self.search_edit.setPlaceholderText('Search snippets')
+        self.search_edit.textChanged.connect(self._schedule_search)
+        self.search_edit.returnPressed.connect(self.next_result)
+        layout.addWidget(self.search_edit)
+
+        filters_layout = QHBoxLayout()
+        self.field_combo = ComboBox(self)
+        self.field_combo.addItem('All fields')
+        self.field_combo.addItems(list(SEARCH_FIELDS))
+        self.field_combo.currentIndexChanged.connect(self._schedule_search)
+        self.type_combo = ComboBox(self)
+        self.type_combo.addItem('All types')
+        self.type_combo.addItems(list(SNIPPET_FACTORIES))
+        self.type_combo.currentIndexChanged.connect(self._schedule_search)
+        filters_layout.addWidget(self.field_combo, 1)
+        filters_layout.addWidget(self.type_combo, 1)
+        layout.addLayout(filters_layout)
+
+        navigation_layout = QHBoxLayout()
+        self.count_label = CaptionLabel(self)
+        previous_button = TransparentToolButton(FluentIcon.UP, self)
+        previous_button.clicked.connect(self.previous_result)
+        next_button = TransparentToolButton(FluentIcon.DOWN, self)
+        next_button.clicked.connect(self.next_result)
+        navigation_layout.addWidget(self.count_label, 1)
+        navigation_layout.addWidget(previous_button)
+        navigation_layout.addWidget(next_button)
+        layout.addLayout(navigation_layout)
+
+        self.results_list = ListWidget(self)
+        self.results_list.setUniformItemSizes(True)
+        self.results_list.itemClicked.connect(lambda item: self._go_to(self.results_list.row(item)))
+        layout.addWidget(self.results_list, 1)
+
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(150)
+        self._search_timer.timeout.connect(self.search)
+
+        # Result rows are positions in the list, so any structural change runs the query again.
+        for signal in (snippet_model.rowsInserted, snippet_model.rowsRemoved, snippet_model.rowsMoved,
+                       snippet_model.modelReset, snippet_model.layoutChanged):
+            signal.connect(self._schedule_search)
+
+    def focus_search(self) -> None:
+        self.search_edit.setFocus(Qt.FocusReason.ShortcutFocusReason)
+        self.search_edit.selectAll()
+
+    def _schedule_search(self, *_) -> None:
+        self._search_timer.start()
+
+    def search(self) -> None:
+        text = self.search_edit.text()
+        field = self.field_combo.currentText() if self.field_combo.currentIndex() > 0 else None
+        types = [self.type_combo.currentText()] if self.type_combo.currentIndex() > 0 else None
+
+        snippets = self.snippet_model.snippets
+        if text or types:
+            self._result_rows = self.index.search(snippets, text, field, types)
+        else:
+            self._result_rows = []
+        self._position = -1
+
+        shown = self._result_rows[:MAX_SHOWN_RESULTS]
+        self.results_list.clear()
+        self.results_list.addItems([
+            f'{snippets[row].type} #{row + 1}  {self.index.preview(snippets[row])}' for row in shown
+        ])
+
+        if not (text or types):
+            self.count_label.setText('')
+        elif len(shown) < len(self._result_rows):
+            self.count_label.setText(f'{len(self._result_rows)} matches, first {len(shown)} listed')
+        else:
+            self.count_label.setText(f'{len(self._result_rows)} matches')
+
+    def _go_to(self, position: int) -> None:
+        if not 0 <= position < len(self._result_rows):
+            return
+        self._position = position
+        if position < self.results_list.count():
+            self.results_list.setCurrentRow(position)
+        self.result_activated.emit(self._result_rows[position])
+
+    def _flush_search(self) -> None:
+        if self._search_timer.isActive():
+            self._search_timer.stop()
+            self.search()
+
+    def next_result(self) -> None:
+        self._flush_search()
+        if self._result_rows:
+            self._go_to((self._position + 1) % len(self._result_rows))
+
+    def previous_result(self) -> None:
+        self._flush_search()
+        if self._result_rows:
+            self._go_to((self._position - 1) % len(self._result_rows))
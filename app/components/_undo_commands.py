@@ -0,0 +1,212 @@
+from typing import Callable, Optional
+
+from PySide6.QtGui import QUndoCommand
+
+from app.data_model import MetaData
+from app.snippets import BaseSnippet
+from ._snippet_list_model import SnippetListModel
+
+MERGE_PROPERTY_EDITS = 1
+MERGE_MODEL_PROPERTY_EDITS = 2
+
+
+class RecordedCommand(QUndoCommand):
+    """
+    An edit that has already been made when it is pushed, which is how the editor works: widgets change the story
+    first and record the inverse afterwards. The ``redo()`` that ``QUndoStack.push()`` runs is therefore skipped.
+    Commands keep only what the edit touched, so the history grows with the edits and not with the story.
+    """
+
+    def __init__(self, text: str, on_changed: Optional[Callable[[], None]] = None):
+        super().__init__(text)
+        self.on_changed = on_changed
+        self._pushed = False
+
+    def redo(self):
+        if not self._pushed:
+            self._pushed = True
+            return
+        self.apply()
+        if self.on_changed is not None:
+            self.on_changed()
+
+    def undo(self):
+        self.revert()
+        if self.on_changed is not None:
+            self.on_changed()
+
+    def apply(self) -> None:
+        raise NotImplementedError
+
+    def revert(self) -> None:
+        raise NotImplementedError
+
+
+class CallbackCommand(RecordedCommand):
+    """A recorded edit whose redo and undo are given as callables."""
+
+    def __init__(self, text: str, apply: Callable[[], None], revert: Callable[[], None],
+                 on_changed: Optional[Callable[[], None]] = None):
+        super().__init__(text, on_changed)
+        self._apply = apply
+        self._revert = revert
+
+    def apply(self) -> None:
+        self._apply()
+
+    def revert(self) -> None:
+        self._revert()
+
+
+class SetPropertiesCommand(RecordedCommand):
+    """
+    Property values set on snippets, as ``(snippet, path, old value, new value)``. With ``merge``, consecutive
+    edits of the same properties in the same ``session`` (typing in a field, stepping a spin box) collapse into one
+    step; a new session starts a new step.
+    """
+
+    def __init__(self, text: str, changes: list[tuple[BaseSnippet, str, object, object]], merge: bool = False,
+                 on_changed: Optional[Callable[[], None]] = None, session: int = 0):
+        super().__init__(text, on_changed)
+        self.changes = changes
+        self.merge = merge
+        self.session = session
+
+    def _targets(self) -> list[tuple[BaseSnippet, str]]:
+        return [(snippet, path) for snippet, path, _, _ in self.changes]
+
+    def id(self):
+        return MERGE_PROPERTY_EDITS if self.merge else -1
+
+    def mergeWith(self, other):
+        if not (isinstance(other, SetPropertiesCommand) and other.merge and other.session == self.session
+                and self._targets() == other._targets()):
+            return False
+        self.changes = [
+            (snippet, path, old, new)
+            for (snippet, path, old, _), (_, _, _, new) in zip(self.changes, other.changes)
+        ]
+        return True
+
+    def apply(self) -> None:
+        for snippet, path, _, new in self.changes:
+            snippet.set_property(path, new)
+
+    def revert(self) -> None:
+        for snippet, path, old, _ in reversed(self.changes):
+            snippet.set_property(path, old)
+
+
+class SetModelPropertyCommand(RecordedCommand):
+    """A property of a library model changed; steps of a spin box on the same property merge into one."""
+
+    def __init__(self, meta_data: MetaData, index: int, key: str, old, new,
+                 on_changed: Optional[Callable[[], None]] = None):
+        super().__init__(f'Edit model {key}', on_changed)
+        self.meta_data = meta_data
+        self.index = index
+        self.key = key
+        self.old = old
+        self.new = new
+
+    def id(self):
+        return MERGE_MODEL_PROPERTY_EDITS
+
+    def mergeWith(self, other):
+        if not (isinstance(other, SetModelPropertyCommand) and (other.index, other.key) == (self.index, self.key)):
+            return False
+        self.new = other.new
+        return True
+
+    def apply(self) -> None:
+        self.meta_data.set_model_property(self.index, self.key, self.new)
+
+    def revert(self) -> None:
+        self.meta_data.set_model_property(self.index, self.key, self.old)
+
+
+class ListItemCommand(RecordedCommand):
+    """An item added to (``added``) or removed from a list property of a snippet."""
+
+    def __init__(self, snippet: BaseSnippet, path: str, index: int, item, added: bool,
+                 on_changed: Optional[Callable[[], None]] = None):
+        super().__init__(f"{'Add' if added else 'Remove'} {path.split('.')[-1]} item", on_changed)
+        self.snippet = snippet
+        self.path = path
+        self.index = index
+        self.item = item
+        self.added = added
+
+    def apply(self) -> None:
+        if self.added:
+            self.snippet.insert_list_item(self.path, self.index, self.item)
+        else:
+            self.snippet.remove_list_item(self.path, self.index)
+
+    def revert(self) -> None:
+        if self.added:
+            self.snippet.remove_list_item(self.path, self.index)
+        else:
+            self.snippet.insert_list_item(self.path, self.index, self.item)
+
+
+class InsertSnippetsCommand(RecordedCommand):
+    def __init__(self, text: str, model: SnippetListModel, row: int, snippets: list[BaseSnippet],
+                 select: Callable[[int, int], None]):
+        super().__init__(text)
+        self.model = model
+        self.row = row
+        self.snippets = snippets
+        self.select = select
+
+    def apply(self) -> None:
+        self.model.insert_snippets(self.row, self.snippets)
+        self.select(self.row, len(self.snippets))
+
+    def revert(self) -> None:
+        self.model.remove_snippets(self.row, len(self.snippets))
+        if self.model.snippets:
+            self.select(min(self.row, len(self.model.snippets) - 1), 1)
+
+
+class RemoveSnippetsCommand(RecordedCommand):
+    """Snippets removed in contiguous runs, as returned by ``SnippetListModel.remove_rows``."""
+
+    def __init__(self, model: SnippetListModel, runs: list[tuple[int, list[BaseSnippet]]],
+                 select: Callable[[int, int], None]):
+        super().__init__(f'Delete {sum(len(snippets) for _, snippets in runs)} snippets')
+        self.model = model
+        self.runs = runs
+        self.select = select
+
+    def apply(self) -> None:
+        self.model.remove_rows(row for first, snippets in self.runs for row in range(first, first + len(snippets)))
+        if self.model.snippets:
+            self.select(min(self.runs[0][0], len(self.model.snippets) - 1), 1)
+
+    def revert(self) -> None:
+        # Runs are in row order, so putting each back at its row restores the rows after it too.
+        for row, snippets in self.runs:
+            self.model.insert_snippets(row, snippets)
+        self.select(self.runs[0][0], len(self.runs[0][1]))
+
+
+class MoveSnippetsCommand(RecordedCommand):
+    """Rows moved as one block in front of ``destination``, landing at ``first``."""
+
+    def __init__(self, model: SnippetListModel, rows: list[int], destination: int, first: int,
+                 select: Callable[[int, int], None]):
+        super().__init__(f'Move {len(rows)} snippets')
+        self.model = model
+        self.rows = rows
+        self.destination = destination
+        self.first = first
+        self.select = select
+
+    def apply(self) -> None:
+        self.model.move_rows(self.rows, self.destination)
+        self.select(self.first, len(self.rows))
+
+    def revert(self) -> None:
+        self.model.restore_rows(self.first, self.rows)
+        self.select(self.rows[0], 1)
@@ -1,9 +1,9 @@
-import json
 from typing import Optional
 
+import httpx
 from PySide6.QtCore import Signal, QObject
 
-from app.utils import get_motions
+from app.story_io import build_model_entry
 
 
 class MetaData(QObject):
@@ -52,75 +52,29 @@ class MetaData(QObject):
             i += 1
         self._models = result
 
-    def add_model(self, model_name: str, path: str, downloaded: bool, id_: Optional[int] = None) -> dict:
+    def add_model(self, model_name: str, path: str, downloaded: bool, id_: Optional[int] = None,
+                  client: Optional[httpx.Client] = None) -> dict:
         self.renumber_models()
 
-        motions = ["None"]
-        expressions = ["None"]
-
-        if not downloaded:
-            result = get_motions(path)
-
-            if result['model']:
-                if 'motions' in result['model']:
-                    motions.extend(result['model']['motions'])
-                if 'expressions' in result['model']:
-                    expressions.extend(result['model']['expressions'])
-            if result['special']:
-                if 'motions' in result['special']:
-                    motions.extend(result['special']['motions'])
-                if 'expressions' in result['special']:
-                    expressions.extend(result['special']['expressions'])
-            if result['common']:
-                if 'motions' in result['common']:
-                    motions.extend(result['common']['motions'])
-                if 'expressions' in result['common']:
-                    expressions.extend(result['common']['expressions'])
-            model_version = 3
-        else:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-                if 'motions' in data:
-                    # Cubism2
-                    motions_data: dict = data.get('motions')
-                    if motions_data:
-                        local_motions = motions_data.keys()
-                        for motion in local_motions:
-                            motions.append(motion)
-                    model_version = 2
-                else:
-                    # Cubism4
-                    motions_data: dict = data["FileReferences"].get('Motions')
-
-                    if motions_data:
-                        local_motions = motions_data.keys()
-                        for motion in local_motions:
-                            if motion.startswith("face_"):
-                                expressions.append(motion)
-                            else:
-                                motions.append(motion)
-                    model_version = 3
-
         if not id_:
             id_ = len(self._models)
 
-        data = {
-            "id": id_,
-            "model_name": model_name,
-            "path": path,
-            "downloaded": downloaded,
-            "motions": motions,
-            "expressions": expressions,
-            "version": model_version,
-            "normal_scale": 2.1,
-            "small_scale": 1.8,
-            "anchor": 0.5,
-        }
+        return self.add_model_entry(build_model_entry(model_name, path, downloaded, id_, client))
+
+    def add_model_entry(self, data: dict) -> dict:
         self.model_updated.emit(data)
         self._models.append(data)
         return data
 
+    def insert_model_entry(self, position: int, data: dict) -> None:
+        self._models.insert(position, data)
+        self.renumber_models()
+        self.model_updated.emit(data)
+
+    def set_model_property(self, id_: int, key: str, value) -> None:
+        self._models[id_][key] = value
+        self.model_updated.emit(self._models[id_])
+
     def renumber_images(self):
         result = []
         i = 0
@@ -155,6 +109,11 @@ class MetaData(QObject):
 
         return data
 
+    def insert_image(self, position: int, data: dict) -> None:
+        self._images.insert(position, data)
+        self.renumber_images()
+        self.image_updated.emit(data)
+
     def reset_model(self) -> None:
         self._models = []
 
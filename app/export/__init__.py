@@ -0,0 +1,10 @@
+from ._exporter import StoryExporter, dump_story, format_plan
+from ._manifest import ExportManifest, ChangeSet, hash_file, hash_files, hash_bytes
+from ._download import download_file, DownloadError
+from ._progress import ExportProgress, ExportCancelled, format_bytes, format_duration
+from ._options import ExportOptions
+from ._store import AssetStore
+from ._archive import StoryArchiveWriter
+from ._batch import BatchExporter
+from ._verify import verify_export
+from ._service import ExportService, ExportJob, PRIORITY_INTERACTIVE, PRIORITY_EXPORT, PRIORITY_PLAN
@@ -0,0 +1,124 @@
+import os
+import struct
+import threading
+import zlib
+
+# Media formats that are already compressed; deflating them again only costs time.
+STORED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.avif', '.gif', '.ogg', '.mp3', '.m4a', '.aac', '.zip'}
+COMPRESS_LEVEL = 6
+
+_ZIP64_LIMIT = 0xFFFFFFFF
+_ZIP64_COUNT_LIMIT = 0xFFFF
+# 1980-01-01 00:00:00, so that identical content produces identical entries.
+_DOS_TIME = 0
+_DOS_DATE = (0 << 9) | (1 << 5) | 1
+_UTF8_FLAG = 0x0800
+
+
+def should_compress(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() not in STORED_EXTENSIONS
+
+
+class StoryArchiveWriter:
+    """
+    Minimal streaming ZIP writer. ``add`` compresses in the calling thread (zlib releases the GIL, so a thread pool
+    compresses entries in parallel) and only appends the finished entry under a lock. The archive is written to a
+    part file and renamed over the target on ``close``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.part_path = path + '.part'
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(self.part_path, 'wb')
+        self._lock = threading.Lock()
+        self._entries: list[tuple[bytes, int, int, int, int, int]] = []
+        self._names: set[str] = set()
+
+    def add(self, name: str, data: bytes, compress: bool = None) -> None:
+        if compress is None:
+            compress = should_compress(name)
+
+        crc = zlib.crc32(data)
+        method = 0
+        payload = data
+        if compress and data:
+            compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+            compressed = compressor.compress(data) + compressor.flush()
+            if len(compressed) < len(data):
+                method = 8
+                payload = compressed
+
+        encoded_name = name.encode('utf-8')
+        size, compressed_size = len(data), len(payload)
+        zip64 = size >= _ZIP64_LIMIT or compressed_size >= _ZIP64_LIMIT
+        extra = struct.pack('<HHQQ', 0x0001, 16, size, compressed_size) if zip64 else b''
+
+        with self._lock:
+            if name in self._names:
+                raise ValueError(f'Duplicate archive entry: {name}')
+            self._names.add(name)
+
+            offset = self._file.tell()
+            self._file.write(struct.pack(
+                '<IHHHHHIIIHH',
+                0x04034b50, 45 if zip64 else 20, _UTF8_FLAG, method, _DOS_TIME, _DOS_DATE, crc,
+                _ZIP64_LIMIT if zip64 else compressed_size, _ZIP64_LIMIT if zip64 else size,
+                len(encoded_name), len(extra)
+            ))
+            self._file.write(encoded_name)
+            self._file.write(extra)
+            self._file.write(payload)
+            self._entries.append((encoded_name, method, crc, compressed_size, size, offset))
+
+    def add_file(self, name: str, path: str, compress: bool = None) -> None:
+        with open(path, 'rb') as f:
+            self.add(name, f.read(), compress)
+
+    def close(self) -> None:
+        with self._lock:
+            directory_offset = self._file.tell()
+            for encoded_name, method, crc, compressed_size, size, offset in self._entries:
+                zip64_fields = []
+                if size >= _ZIP64_LIMIT or compressed_size >= _ZIP64_LIMIT:
+                    zip64_fields.extend((size, compressed_size))
+                if offset >= _ZIP64_LIMIT:
+                    zip64_fields.append(offset)
+                extra = struct.pack(f'<HH{len(zip64_fields)}Q', 0x0001, 8 * len(zip64_fields), *zip64_fields) \
+                    if zip64_fields else b''
+                large_sizes = len(zip64_fields) >= 2
+
+                self._file.write(struct.pack(
+                    '<IHHHHHHIIIHHHHHII',
+                    0x02014b50, (3 << 8) | 45, 45 if zip64_fields else 20, _UTF8_FLAG, method, _DOS_TIME,
+                    _DOS_DATE, crc,
+                    _ZIP64_LIMIT if large_sizes else compressed_size, _ZIP64_LIMIT if large_sizes else size,
+                    len(encoded_name), len(extra), 0, 0, 0, (0o100644 << 16),
+                    _ZIP64_LIMIT if offset >= _ZIP64_LIMIT else offset
+                ))
+                self._file.write(encoded_name)
+                self._file.write(extra)
+
+            directory_end = self._file.tell()
+            directory_size = directory_end - directory_offset
+            count = len(self._entries)
+
+            if count >= _ZIP64_COUNT_LIMIT or directory_offset >= _ZIP64_LIMIT or directory_size >= _ZIP64_LIMIT:
+                self._file.write(struct.pack(
+                    '<IQHHIIQQQQ', 0x06064b50, 44, (3 << 8) | 45, 45, 0, 0, count, count, directory_size,
+                    directory_offset
+                ))
+                self._file.write(struct.pack('<IIQI', 0x07064b50, 0, directory_end, 1))
+
+            self._file.write(struct.pack(
+                '<IHHHHIIH', 0x06054b50, 0, 0, min(count, _ZIP64_COUNT_LIMIT), min(count, _ZIP64_COUNT_LIMIT),
+                min(directory_size, _ZIP64_LIMIT), min(directory_offset, _ZIP64_LIMIT), 0
+            ))
+            self._file.close()
+        os.replace(self.part_path, self.path)
+
+    def abort(self) -> None:
+        with self._lock:
+            self._file.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
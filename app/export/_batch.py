@@ -0,0 +1,85 @@
+import logging
+import time
+from dataclasses import replace
+from typing import Callable, Optional
+
+import httpx
+from httpx_retries import RetryTransport, Retry
+
+from ._exporter import StoryExporter
+from ._options import ExportOptions
+from ._progress import ExportProgress, ExportCancelled
+from ._store import AssetStore
+
+logger = logging.getLogger(__name__)
+
+
+class BatchExporter:
+    """
+    Exports several stories, one after another, in one process. The stories share one content store and one HTTP
+    client: a file used by several stories is hashed and stored once and materialized into each story as a link,
+    and the store's hash cache lives for the whole batch instead of being rebuilt per story.
+
+    ``stories`` holds ``(output path, {"models", "images", "snippets"})`` pairs, as returned by ``load_story``.
+    """
+
+    def __init__(self, stories: list[tuple[str, dict]], options: Optional[ExportOptions] = None,
+                 on_progress: Optional[Callable[[dict], None]] = None):
+        # The store is what the stories share, so it is always used.
+        self.options = replace(options or ExportOptions(), use_asset_store=True)
+        self.progress = ExportProgress(on_progress)
+        self.client = httpx.Client(transport=RetryTransport(retry=Retry(total=10, backoff_factor=0.5)))
+        self.store = AssetStore()
+
+        self.exporters = []
+        for output, story in stories:
+            # Each story keeps its own cancel event: a failed transfer stops its own workers, not the batch.
+            snippets = [snippet.build() for snippet in story['snippets']]
+            exporter = StoryExporter(output, story['models'], story['images'], snippets, on_progress, self.options,
+                                     client=self.client)
+            exporter.store = self.store
+            self.exporters.append(exporter)
+
+    def cancel(self) -> None:
+        self.progress.cancel()
+        for exporter in self.exporters:
+            exporter.cancel()
+
+    def run(self) -> dict:
+        """
+        Returns ``{"stories": [{"output", "files", "resolve_seconds", "write_seconds", "error"}], "total_seconds"}``.
+        A story that fails is reported and the others are still exported.
+        """
+        started = time.monotonic()
+        entries = [
+            {'output': exporter.file_path, 'files': 0, 'resolve_seconds': 0.0, 'write_seconds': 0.0, 'error': None}
+            for exporter in self.exporters
+        ]
+
+        def timed(entry: dict, key: str, fn):
+            step_started = time.monotonic()
+            try:
+                return fn()
+            except ExportCancelled:
+                raise
+            except Exception as e:
+                logger.error('Failed: %s: %s', entry['output'], e)
+                entry['error'] = str(e)
+            finally:
+                entry[key] += time.monotonic() - step_started
+
+        try:
+            for exporter, entry in zip(self.exporters, entries):
+                self.progress.checkpoint()
+                parts = timed(entry, 'resolve_seconds', exporter.resolve)
+                if entry['error'] is None:
+                    timed(entry, 'write_seconds', lambda: exporter.write(*parts))
+                    entry['files'] = len(exporter.targets)
+        finally:
+            self.client.close()
+
+        self.progress.set_stage('Done')
+        return {
+            'stories': entries,
+            'total_seconds': time.monotonic() - started,
+        }
@@ -0,0 +1,163 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+from typing import Optional
+
+import httpx
+
+from ._progress import ExportProgress
+
+logger = logging.getLogger(__name__)
+
+PART_SUFFIX = '.part'
+CHUNK_SIZE = 256 * 1024
+MAX_ATTEMPTS = 5
+
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+
+class DownloadError(Exception):
+    pass
+
+
+def _hash_part(path: str, h) -> int:
+    size = 0
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            h.update(chunk)
+            size += len(chunk)
+    return size
+
+
+def _expected_size(resp: httpx.Response, offset: int) -> Optional[int]:
+    if resp.status_code == 206:
+        match = _CONTENT_RANGE.fullmatch(resp.headers.get('content-range', ''))
+        if not match or int(match.group(1)) != offset:
+            raise DownloadError(f'Unexpected Content-Range {resp.headers.get("content-range")!r}')
+        return int(match.group(3)) if match.group(3) != '*' else None
+
+    length = resp.headers.get('content-length')
+    return int(length) if length is not None else None
+
+
+def download_file(client: httpx.Client, url: str, dest: str,
+                  progress: Optional[ExportProgress] = None) -> tuple[str, int]:
+    """
+    Streams ``url`` into ``dest + '.part'`` and renames it over ``dest`` once the status and size are verified, so
+    ``dest`` is either absent, the previous version or complete. A leftover part file from an interrupted run, or
+    from a cancelled one, is resumed with a Range request. Returns the sha256 and size of the file.
+    """
+    part_path = dest + PART_SUFFIX
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+    last_error = None
+    for attempt in range(MAX_ATTEMPTS):
+        h = hashlib.sha256()
+        offset = _hash_part(part_path, h) if os.path.exists(part_path) else 0
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+
+        try:
+            with client.stream('GET', url, headers=headers) as resp:
+                if resp.status_code == 416:
+                    # The part file does not match the remote file any more.
+                    os.remove(part_path)
+                    last_error = DownloadError(f'{url}: range not satisfiable, restarting')
+                    continue
+                if resp.status_code not in (200, 206):
+                    raise DownloadError(f'{url}: HTTP {resp.status_code}')
+
+                if resp.status_code == 200 and offset:
+                    # The server ignored the Range header.
+                    h = hashlib.sha256()
+                    offset = 0
+
+                expected = _expected_size(resp, offset)
+                if progress is not None and attempt == 0 and expected is not None:
+                    progress.add_expected_bytes(expected - offset)
+
+                size = offset
+                with open(part_path, 'ab' if offset else 'wb') as file:
+                    for chunk in resp.iter_raw(CHUNK_SIZE):
+                        if progress is not None:
+                            progress.checkpoint()
+                            progress.add_bytes(len(chunk))
+                        file.write(chunk)
+                        h.update(chunk)
+                        size += len(chunk)
+        except httpx.TransportError as e:
+            last_error = e
+            logger.warning('Download interrupted, resuming: %s (%s)', url, e)
+            continue
+
+        if expected is not None and size != expected:
+            last_error = DownloadError(f'{url}: expected {expected} bytes, got {size}')
+            logger.warning('Download incomplete, resuming: %s', last_error)
+            continue
+
+        os.replace(part_path, dest)
+        return h.hexdigest(), size
+
+    raise DownloadError(f'Failed to download {url} after {MAX_ATTEMPTS} attempts: {last_error}')
+
+
+def download_bytes(client: httpx.Client, url: str, progress: Optional[ExportProgress] = None) -> bytes:
+    """Like ``download_file``, but streams into memory, for entries that go straight into a package."""
+    buffer = bytearray()
+
+    last_error = None
+    for attempt in range(MAX_ATTEMPTS):
+        offset = len(buffer)
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+
+        try:
+            with client.stream('GET', url, headers=headers) as resp:
+                if resp.status_code not in (200, 206):
+                    raise DownloadError(f'{url}: HTTP {resp.status_code}')
+
+                if resp.status_code == 200 and offset:
+                    del buffer[:]
+                    offset = 0
+
+                expected = _expected_size(resp, offset)
+                if progress is not None and attempt == 0 and expected is not None:
+                    progress.add_expected_bytes(expected)
+
+                for chunk in resp.iter_raw(CHUNK_SIZE):
+                    if progress is not None:
+                        progress.checkpoint()
+                        progress.add_bytes(len(chunk))
+                    buffer.extend(chunk)
+        except httpx.TransportError as e:
+            last_error = e
+            logger.warning('Download interrupted, resuming: %s (%s)', url, e)
+            continue
+
+        if expected is not None and len(buffer) != expected:
+            last_error = DownloadError(f'{url}: expected {expected} bytes, got {len(buffer)}')
+            logger.warning('Download incomplete, resuming: %s', last_error)
+            continue
+
+        return bytes(buffer)
+
+    raise DownloadError(f'Failed to download {url} after {MAX_ATTEMPTS} attempts: {last_error}')
+
+
+def atomic_write(dest: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    part_path = dest + PART_SUFFIX
+    with open(part_path, 'wb') as file:
+        file.write(data)
+    os.replace(part_path, dest)
+
+
+def atomic_copy(source: str, dest: str) -> None:
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    part_path = dest + PART_SUFFIX
+    shutil.copyfile(source, part_path)
+    os.replace(part_path, dest)
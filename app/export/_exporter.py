@@ -0,0 +1,789 @@
+import copy
+import json
+import logging
+import os
+import posixpath
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+import httpx
+from httpx_retries import RetryTransport, Retry
+
+from app.server import cached_file_path
+from app.utils import extract_url_path, get_motions, unwrap_proxy_url
+from ._archive import StoryArchiveWriter
+from ._download import download_file, download_bytes, atomic_write, atomic_copy, DownloadError
+from ._manifest import ExportManifest, ChangeSet, hash_bytes, hash_files, stat_file, same_path
+from ._options import ExportOptions
+from ._progress import ExportProgress, format_bytes, format_duration
+from ._store import AssetStore
+from ._transcode import IMAGE_FORMATS, TRANSCODE_VERSION, derived_path, transcode_image, recompress_texture, \
+    is_available as transcode_available
+
+logger = logging.getLogger(__name__)
+
+STORY_SCHEMA = 'https://raw.githubusercontent.com/Untitled-Story/MySekaiStoryteller/refs/heads/master/sekai-story.schema.json'
+DOWNLOAD_WORKERS = 16
+CHECKPOINT_INTERVAL = 5.0
+CONTENT_NAME_LENGTH = 32
+# Rough rates used by plan() to estimate how long an export takes.
+NETWORK_BYTES_PER_SECOND = 4 * 1024 * 1024
+DISK_BYTES_PER_SECOND = 150 * 1024 * 1024
+REQUEST_LATENCY = 0.3
+
+
+def format_plan(report: dict) -> str:
+    download, cached, copy = report['download'], report['cached'], report['copy']
+    lines = [
+        f"Download: {download['files']} files, {format_bytes(download['bytes'])}"
+        + (f" ({download['unknown_size']} of unknown size)" if download['unknown_size'] else ''),
+        f"From local cache: {cached['files']} files, {format_bytes(cached['bytes'])}",
+        f"Copy: {copy['files']} files, {format_bytes(copy['bytes'])}",
+        f"Unchanged: {report['skip']['files']} files, {format_bytes(report['skip']['bytes'])}",
+        f"Delete: {report['delete']['files']} files",
+        f"Estimated time: {format_duration(report['estimated_seconds'])}",
+    ]
+    return '\n'.join(lines)
+
+
+def dump_story(story: dict) -> str:
+    return json.dumps(story, indent=2, ensure_ascii=False)
+
+
+def model_motion_files(model_data: dict) -> dict[str, list[str]]:
+    """Motion group name -> files, for Cubism2 (``motions``) and Cubism3+ (``FileReferences.Motions``) layouts."""
+    groups = model_data.get('motions') or model_data.get('FileReferences', {}).get('Motions') or {}
+    result = {}
+    for name, entries in groups.items():
+        files = [entry.get('File') or entry.get('file') for entry in entries if isinstance(entry, dict)]
+        result[name] = [os.path.normpath(file).replace("\\", "/") for file in files if file]
+    return result
+
+
+def model_referenced_files(model_data: dict) -> list[str]:
+    """Every file a Cubism2 or Cubism3+ model json references, relative to the model folder."""
+    refs = []
+    if 'FileReferences' in model_data:
+        file_refs = model_data['FileReferences']
+        refs.extend(file_refs.get(key) for key in ('Moc', 'Physics', 'Pose', 'UserData', 'DisplayInfo'))
+        refs.extend(file_refs.get('Textures') or [])
+        refs.extend(entry.get('File') for entry in file_refs.get('Expressions') or [])
+        for entries in (file_refs.get('Motions') or {}).values():
+            for entry in entries:
+                refs.extend((entry.get('File'), entry.get('Sound')))
+    else:
+        refs.extend(model_data.get(key) for key in ('model', 'physics', 'pose'))
+        refs.extend(model_data.get('textures') or [])
+        refs.extend(entry.get('file') for entry in model_data.get('expressions') or [])
+        for entries in (model_data.get('motions') or {}).values():
+            for entry in entries:
+                refs.extend((entry.get('file'), entry.get('sound')))
+
+    return list(dict.fromkeys(
+        posixpath.normpath(ref.replace("\\", "/")) for ref in refs if isinstance(ref, str) and ref
+    ))
+
+
+def package_story_name(package_path: str) -> str:
+    name = os.path.basename(package_path)
+    for suffix in ('.sekai-story.zip', '.zip'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return f'{name}.sekai-story.json'
+
+
+class StoryExporter:
+    def __init__(self, file_path: str, models: list, images: list, snippets: list[dict],
+                 on_progress: Optional[Callable[[dict], None]] = None, options: Optional[ExportOptions] = None,
+                 client: Optional[httpx.Client] = None, cancel_event: Optional[threading.Event] = None):
+        self.file_path = file_path
+        self.models = models
+        self.images = images
+        # The snippets as built (BaseSnippet.build()), so a worker never reads snippets the editor is changing.
+        self.snippets = snippets
+        self.base_path = os.path.dirname(self.file_path)
+        # A client passed in (e.g. ExportService's pooled one) outlives this export and is not closed here.
+        self._owns_client = client is None
+        self.client = client or httpx.Client(transport=RetryTransport(retry=Retry(total=10, backoff_factor=0.5)))
+        self.manifest = ExportManifest(self.file_path)
+        self.progress = ExportProgress(on_progress, cancel_event)
+        self.options = options or ExportOptions()
+        self.store = AssetStore() if self.options.use_asset_store else None
+
+        # rel path -> {"kind": "copy" | "download" | "write", "source": str, ["url": str], ["data": bytes, "hash": str]}
+        self.targets: dict[str, dict] = {}
+        # (snippet index, voice as exported, voice path in voices/)
+        self._voice_updates: list[tuple[int, str, str]] = []
+        self.texture_rels: list[str] = []
+        # model id -> {"dir": rel dir, "model": rel model json, "motions": {name: [rel]}}, for the preload schedule
+        self.model_assets: dict[int, dict] = {}
+        # Sizes of entries written into a package, where there is no exported file to stat afterwards.
+        self.package_sizes: dict[str, int] = {}
+        # model json URL -> (model json, motion URLs)
+        self.online_models: dict[str, tuple[dict, list]] = {}
+        # A dry run resolves the same targets but skips every stage that produces files.
+        self.dry_run = False
+
+    def add_target(self, rel: str, kind: str, source: str, data: bytes = None) -> None:
+        target = {'kind': kind, 'source': source}
+        if kind != 'copy':
+            # Record URLs without the local server's address, which changes every run.
+            target['source'] = unwrap_proxy_url(source)
+            target['url'] = source
+        if data is not None:
+            target['data'] = data
+            target['hash'] = hash_bytes(data)
+        self.targets[rel] = target
+
+    @staticmethod
+    def gen_motion_urls(info_url: str, motions_result: dict, type_: str) -> list:
+        result = []
+        base = extract_url_path(info_url)
+
+        if type_ == 'model':
+            base_motion = '/'.join(base.split('/')[:-2]) + "/motions"
+            base_facial = base_motion
+        else:
+            base_motion = base + "motion"
+            base_facial = base + "facial"
+
+        if 'motions' in motions_result[type_]:
+            for motion in motions_result[type_]['motions']:
+                result.append(f"{base_motion}/{motion}.motion3.json")
+        if 'expressions' in motions_result[type_]:
+            for expression in motions_result[type_]['expressions']:
+                result.append(f"{base_facial}/{expression}.motion3.json")
+        return result
+
+    def fetch_online_model(self, path: str) -> tuple[dict, list]:
+        """The model json and its motion URLs, fetched once per path."""
+        cached = self.online_models.get(path)
+        if cached is not None:
+            return cached
+
+        resp = self.client.get(path)
+        if resp.status_code != 200:
+            raise DownloadError(f"{path}: HTTP {resp.status_code}")
+        main_data = resp.json()
+
+        urls = []
+
+        motions_result = get_motions(path, self.client)
+
+        if motions_result['model']:
+            url = motions_result['model_url']
+            urls.extend(self.gen_motion_urls(url, motions_result, 'model'))
+
+        if motions_result['special']:
+            url = motions_result['special_url']
+            urls.extend(self.gen_motion_urls(url, motions_result, 'special'))
+
+        if motions_result['common_url']:
+            url = motions_result['common_url']
+            urls.extend(self.gen_motion_urls(url, motions_result, 'common'))
+
+        self.online_models[path] = main_data, urls
+        return main_data, urls
+
+    def resolve_online_model(self, model: dict, rel_dir: str, file_name: str) -> dict:
+        base_url = extract_url_path(model['path'])
+
+        cached_data, urls = self.fetch_online_model(model['path'])
+        main_data = copy.deepcopy(cached_data)
+        for file_type, reference in main_data['FileReferences'].items():
+            if file_type == 'Moc' or file_type == 'Physics':
+                self.add_target(f'{rel_dir}/{reference}', 'download', base_url + reference)
+            elif file_type == 'Textures':
+                for texture in reference:
+                    self.add_target(f'{rel_dir}/{texture}', 'download', base_url + texture)
+                    self.texture_rels.append(f'{rel_dir}/{texture}')
+
+        main_data["FileReferences"]["Motions"] = {}
+        for url in urls:
+            m_file_name_ext = os.path.basename(urlparse(url).path)
+            m_file_name = m_file_name_ext.split('.motion3.json')[0]
+            main_data["FileReferences"]["Motions"][m_file_name] = [{
+                "FadeInTime": 0.5,
+                "FadeOutTime": 0.5,
+                "File": f"motions/{m_file_name_ext}"
+            }]
+            self.add_target(f'{rel_dir}/motions/{m_file_name_ext}', 'download', url)
+
+        self.add_target(
+            f'{rel_dir}/{file_name}',
+            'write',
+            model['path'],
+            json.dumps(main_data, indent=2, ensure_ascii=False).encode('utf-8')
+        )
+        return main_data
+
+    def resolve_local_model(self, model: dict, rel_dir: str) -> dict:
+        """Copies the model json and the files it references, not whatever else shares its folder."""
+        source_dir = os.path.dirname(model['path'])
+        with open(model['path'], 'r', encoding='utf-8') as f:
+            model_data = json.load(f)
+
+        self.add_target(f"{rel_dir}/{os.path.basename(model['path'])}", 'copy', model['path'])
+        for ref in model_referenced_files(model_data):
+            rel = posixpath.normpath(f'{rel_dir}/{ref}')
+            source = os.path.join(source_dir, ref)
+            # A reference like ../other/tex.png would land in, and overwrite, another model's folder.
+            if not rel.startswith(rel_dir + '/'):
+                logger.warning('Skipping model file outside the model folder: %s', source)
+            elif not os.path.isfile(source):
+                logger.warning('Missing model file: %s', source)
+            else:
+                self.add_target(rel, 'copy', source)
+
+        # Cubism2 lists textures at the top level, Cubism3+ under FileReferences.
+        textures = model_data.get('textures') or model_data.get('FileReferences', {}).get('Textures', [])
+        for texture in textures:
+            rel = posixpath.normpath(f'{rel_dir}/{texture}')
+            if rel in self.targets:
+                self.texture_rels.append(rel)
+        return model_data
+
+    def resolve_models(self) -> list:
+        models_data = []
+        for model in self.models:
+            self.progress.checkpoint()
+            self.progress.set_stage('Resolving', model['model_name'])
+            logger.debug('Resolving: %s', model)
+            suffix = '.model3.json' if model['version'] == 3 else '.model.json'
+
+            rel_model_path = str(os.path.join(
+                model['model_name'],
+                model['model_name'] + suffix
+            )).replace("\\", "/")
+
+            models_data.append({
+                "id": model['id'],
+                "model": rel_model_path,
+                "normal_scale": round(model['normal_scale'], 2),
+                "small_scale": round(model['small_scale'], 2),
+                "anchor": round(model['anchor'], 2),
+            })
+
+            rel_dir = f"models/{model['model_name']}"
+            if not model['downloaded']:
+                model_data = self.resolve_online_model(model, rel_dir, os.path.basename(rel_model_path))
+            else:
+                model_data = self.resolve_local_model(model, rel_dir)
+
+            self.model_assets[model['id']] = {
+                'dir': rel_dir,
+                'model': f'models/{rel_model_path}',
+                'motions': {
+                    name: [rel for rel in (posixpath.normpath(f'{rel_dir}/{file}') for file in files)
+                           if rel in self.targets]
+                    for name, files in model_motion_files(model_data).items()
+                },
+            }
+
+        return models_data
+
+    def hash_sources(self, paths: list[str]) -> dict[str, str]:
+        known = self.manifest.known_hashes()
+        hashes = {}
+        unknown = []
+        for path in paths:
+            known_entry = known.get(os.path.normcase(path))
+            if known_entry is not None and stat_file(path) == known_entry[:2]:
+                hashes[path] = known_entry[2]
+            else:
+                unknown.append(path)
+
+        hashes.update(hash_files(unknown))
+        return hashes
+
+    def run_in_processes(self, stage: str, fn, jobs: list[tuple]) -> None:
+        self.progress.set_stage(stage)
+        self.progress.start_transfer(len(jobs))
+
+        executor = ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1))
+        try:
+            futures = [executor.submit(fn, *args) for args in jobs]
+            for future in as_completed(futures):
+                future.result()
+                self.progress.file_done()
+                self.progress.checkpoint()
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+
+    def optimize_images(self, hashes: dict[str, str]) -> dict[str, str]:
+        """Returns source path -> transcoded file, cached by source hash and encoder settings."""
+        options = self.options
+        _, ext = IMAGE_FORMATS[options.image_format]
+        settings = f'{options.image_format}:{options.image_max_width}x{options.image_max_height}:' \
+                   f'{options.image_quality}:{TRANSCODE_VERSION}'
+
+        results = {}
+        jobs = {}
+        for path, file_hash in hashes.items():
+            if Path(path).suffix.lower() == '.gif':
+                # Animated backgrounds are kept as they are.
+                continue
+            dest = derived_path(hash_bytes(f'{file_hash}:{settings}'.encode('utf-8')), ext)
+            results[path] = dest
+            if not os.path.exists(dest):
+                jobs.setdefault(dest, path)
+
+        if jobs:
+            self.run_in_processes('Optimizing images', transcode_image, [
+                (source, dest, options.image_max_width, options.image_max_height, options.image_format,
+                 options.image_quality)
+                for dest, source in jobs.items()
+            ])
+        return results
+
+    def optimize_textures(self) -> None:
+        """Swaps model texture targets for losslessly recompressed (and optionally downsized) PNGs."""
+        if not transcode_available():
+            logger.warning('Pillow is not installed, textures are exported unchanged.')
+            return
+
+        # Original textures are fetched into the content store, so their hash is known without downloading again.
+        store = self.store or AssetStore()
+        rels = list(dict.fromkeys(self.texture_rels))
+        downloads = [rel for rel in rels if self.targets[rel]['kind'] == 'download']
+
+        inputs = {}
+        if downloads:
+            self.progress.set_stage('Fetching textures')
+            self.progress.start_transfer(len(downloads))
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+                for rel, file_hash in zip(downloads, executor.map(
+                        lambda r: store.fetch(self.client, self.targets[r]['url'], self.targets[r]['source'],
+                                              self.progress), downloads)):
+                    inputs[rel] = (store.object_path(file_hash), file_hash)
+                    self.progress.file_done(rel)
+            store.save_index()
+
+        local = {rel: os.path.abspath(self.targets[rel]['source']) for rel in rels if rel not in inputs}
+        local_hashes = self.hash_sources(list(local.values()))
+        inputs.update({rel: (path, local_hashes[path]) for rel, path in local.items()})
+
+        max_size = self.options.texture_max_size
+        jobs = {}
+        for rel, (path, file_hash) in inputs.items():
+            dest = derived_path(hash_bytes(f'{file_hash}:texture:{max_size}:{TRANSCODE_VERSION}'.encode('utf-8')),
+                                '.png')
+            if not os.path.exists(dest):
+                jobs.setdefault(dest, path)
+            self.targets[rel] = {'kind': 'copy', 'source': dest}
+
+        if jobs:
+            self.run_in_processes('Optimizing textures', recompress_texture,
+                                  [(source, dest, max_size) for dest, source in jobs.items()])
+
+    def resolve_images(self) -> list:
+        paths = [os.path.abspath(image['path']) for image in self.images]
+        hashes = self.hash_sources(paths)
+
+        optimized = {}
+        if self.options.optimize_images and not self.dry_run:
+            if transcode_available():
+                optimized = self.optimize_images(hashes)
+            else:
+                logger.warning('Pillow is not installed, images are exported unchanged.')
+        optimized_hashes = self.hash_sources(list(set(optimized.values())))
+
+        images_data = []
+        used_names = {}
+        for image, path in zip(self.images, paths):
+            if path in optimized:
+                source = optimized[path]
+                file_name_ext = f'{optimized_hashes[source][:CONTENT_NAME_LENGTH]}{Path(source).suffix}'
+            else:
+                source = path
+                file_name_ext = os.path.basename(path)
+                if used_names.setdefault(file_name_ext, hashes[path]) != hashes[path]:
+                    # Another image already uses this basename.
+                    file_name_ext = f'{hashes[path][:CONTENT_NAME_LENGTH]}{Path(path).suffix.lower()}'
+
+            self.add_target(f'images/{file_name_ext}', 'copy', source)
+            images_data.append({
+                "id": image['id'],
+                "image": f'{file_name_ext}'
+            })
+        return images_data
+
+    def resolve_snippets(self) -> list:
+        voices_dir = os.path.abspath(os.path.join(self.base_path, 'voices'))
+
+        snippets_data = list(self.snippets)
+        voiced = []
+        for index, data in enumerate(snippets_data):
+            if 'data' in data and data['data'].get('voice'):
+                # build() results are the snippet's cached ones, so the voice is renamed on a copy.
+                data = snippets_data[index] = {**data, 'data': {**data['data']}}
+                voiced.append((index, data))
+
+        # Voices are named by content, so a clip used twice is stored once and re-saves produce identical names.
+        voice_hashes = self.hash_sources([os.path.abspath(data['data']['voice']) for _, data in voiced])
+
+        for index, data in voiced:
+            exported_voice = data['data']['voice']
+            voice_path = os.path.abspath(exported_voice)
+            voice_name = f'{voice_hashes[voice_path][:CONTENT_NAME_LENGTH]}{Path(voice_path).suffix.lower()}'
+            new_voice_path = os.path.join(voices_dir, voice_name)
+
+            data['data']['voice'] = voice_name
+            self.add_target(f'voices/{voice_name}', 'copy', voice_path)
+            if not same_path(voice_path, new_voice_path):
+                self._voice_updates.append((index, exported_voice, new_voice_path.replace("\\", "/")))
+
+        return snippets_data
+
+    def transfer_from_store(self, rel: str) -> str:
+        target = self.targets[rel]
+        path = self.manifest.abs_path(rel)
+
+        if target['kind'] == 'download':
+            file_hash = self.store.lookup_url(target['source'])
+            if file_hash is None:
+                file_hash = self.store.fetch(self.client, target['url'], target['source'], self.progress)
+                self.store.materialize(file_hash, path)
+                return file_hash
+        elif target['kind'] == 'write':
+            file_hash = self.store.put_bytes(target['data'])
+        else:
+            file_hash = self.store.put_file(target['source'])
+
+        self.store.materialize(file_hash, path)
+        self.progress.add_bytes(os.path.getsize(path))
+        return file_hash
+
+    def transfer(self, rel: str) -> Optional[str]:
+        target = self.targets[rel]
+        path = self.manifest.abs_path(rel)
+        self.progress.checkpoint()
+
+        if self.store is not None:
+            return self.transfer_from_store(rel)
+
+        if target['kind'] == 'download':
+            file_hash, _ = download_file(self.client, target['url'], path, self.progress)
+            return file_hash
+
+        if target['kind'] == 'write':
+            atomic_write(path, target['data'])
+            self.progress.add_bytes(len(target['data']))
+            return target['hash']
+
+        atomic_copy(target['source'], path)
+        self.progress.add_bytes(os.path.getsize(path))
+        return None
+
+    def save_checkpoint(self, done: set[str], hashes: dict[str, str]) -> None:
+        self.manifest.commit({rel: self.targets[rel] for rel in done}, hashes, partial=True)
+        self.manifest.save()
+        if self.store is not None:
+            self.store.save_index()
+
+    def apply(self, change_set: ChangeSet) -> dict[str, str]:
+        pending = change_set.copy + change_set.download + change_set.replace
+        hashes = {}
+        done = set(change_set.skip)
+
+        self.progress.set_stage('Transferring')
+        self.progress.start_transfer(len(pending), sum(
+            len(self.targets[rel]['data']) if self.targets[rel]['kind'] == 'write'
+            else os.path.getsize(self.targets[rel]['source'])
+            for rel in pending if self.targets[rel]['kind'] != 'download'
+        ))
+
+        last_checkpoint = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS)
+        try:
+            futures = {executor.submit(self.transfer, rel): rel for rel in pending}
+            for future in as_completed(futures):
+                rel = futures[future]
+                file_hash = future.result()
+                if file_hash is not None:
+                    hashes[rel] = file_hash
+                done.add(rel)
+                self.progress.file_done(rel)
+
+                if time.monotonic() - last_checkpoint > CHECKPOINT_INTERVAL:
+                    self.save_checkpoint(done, hashes)
+                    last_checkpoint = time.monotonic()
+        except BaseException:
+            # Stop the other workers, then keep every file that was completed and verified for the next run.
+            self.progress.cancel()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.save_checkpoint(done, hashes)
+            raise
+        executor.shutdown()
+        if self.store is not None:
+            self.store.save_index()
+
+        self.progress.checkpoint()
+        self.manifest.delete_stale(change_set)
+        return hashes
+
+    def package_entry(self, archive: StoryArchiveWriter, rel: str) -> None:
+        target = self.targets[rel]
+        self.progress.checkpoint()
+
+        if target['kind'] == 'download':
+            if self.store is not None:
+                file_hash = self.store.fetch(self.client, target['url'], target['source'], self.progress)
+                object_path = self.store.object_path(file_hash)
+                archive.add_file(rel, object_path)
+                self.package_sizes[rel] = os.path.getsize(object_path)
+            else:
+                data = download_bytes(self.client, target['url'], self.progress)
+                archive.add(rel, data)
+                self.package_sizes[rel] = len(data)
+            return
+
+        if target['kind'] == 'write':
+            data = target['data']
+        else:
+            with open(target['source'], 'rb') as f:
+                data = f.read()
+        archive.add(rel, data)
+        self.package_sizes[rel] = len(data)
+        self.progress.add_bytes(len(data))
+
+    def write_package(self, models_data: list, images_data: list, snippets_data: list) -> dict:
+        """Streams every target and the story itself into one archive instead of a folder."""
+        rels = list(self.targets)
+        self.progress.set_stage('Packaging')
+        self.progress.start_transfer(len(rels) + 1, sum(
+            len(self.targets[rel]['data']) if self.targets[rel]['kind'] == 'write'
+            else os.path.getsize(self.targets[rel]['source'])
+            for rel in rels if self.targets[rel]['kind'] != 'download'
+        ))
+
+        archive = StoryArchiveWriter(self.file_path)
+        executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS)
+        try:
+            futures = {executor.submit(self.package_entry, archive, rel): rel for rel in rels}
+            for future in as_completed(futures):
+                future.result()
+                self.progress.file_done(futures[future])
+
+            story = self.build_story(models_data, images_data, snippets_data)
+            archive.add(package_story_name(self.file_path), dump_story(story).encode('utf-8'))
+            self.progress.file_done()
+        except BaseException:
+            self.progress.cancel()
+            executor.shutdown(wait=True, cancel_futures=True)
+            archive.abort()
+            raise
+        executor.shutdown()
+        if self.store is not None:
+            self.store.save_index()
+        archive.close()
+        return story
+
+    def exported_size(self, rel: str) -> int:
+        size = self.package_sizes.get(rel)
+        if size is not None:
+            return size
+        path = self.manifest.abs_path(rel)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def build_preload(self, images_data: list, snippets_data: list) -> list:
+        """
+        Every model, motion, expression, image and voice in the order the snippets first use them, with the files
+        (relative to the story) and their exported size, so a player can fetch each asset just before it is needed.
+        """
+        image_files = {image['id']: f"images/{image['image']}" for image in images_data}
+        motion_rels = {rel for assets in self.model_assets.values() for files in assets['motions'].values()
+                       for rel in files}
+
+        preload = []
+        seen = set()
+
+        def add(index: int, key: tuple, entry: dict, files: list[str]):
+            if key in seen or not files:
+                return
+            seen.add(key)
+            preload.append({
+                'snippet': index,
+                **entry,
+                'files': files,
+                'bytes': sum(self.exported_size(rel) for rel in files),
+            })
+
+        for index, snippet in enumerate(snippets_data):
+            data = snippet.get('data') or {}
+
+            model_id = data.get('modelId')
+            assets = self.model_assets.get(model_id)
+            if assets is not None:
+                model_files = [
+                    rel for rel in self.targets
+                    if rel.startswith(assets['dir'] + '/') and rel not in motion_rels
+                ]
+                # The model json first, so a player can start parsing while the rest arrives.
+                model_files.sort(key=lambda rel: rel != assets['model'])
+                add(index, ('model', model_id), {'type': 'model', 'modelId': model_id}, model_files)
+
+                for field, kind in (('motion', 'motion'), ('facial', 'expression')):
+                    name = data.get(field)
+                    if name and name != 'None':
+                        add(index, (kind, model_id, name), {'type': kind, 'modelId': model_id, 'name': name},
+                            assets['motions'].get(name, []))
+
+            image_id = data.get('imageId')
+            if image_id in image_files:
+                add(index, ('image', image_id), {'type': 'image', 'imageId': image_id}, [image_files[image_id]])
+
+            if data.get('voice'):
+                voice_rel = f"voices/{data['voice']}"
+                add(index, ('voice', voice_rel), {'type': 'voice'}, [voice_rel])
+
+        return preload
+
+    def build_story(self, models_data: list, images_data: list, snippets_data: list) -> dict:
+        return {
+            '$schema': STORY_SCHEMA,
+            'models': models_data,
+            'images': images_data,
+            'preload': self.build_preload(images_data, snippets_data),
+            'snippets': snippets_data,
+        }
+
+    def download_size(self, rel: str) -> tuple[str, Optional[int]]:
+        """Where a download would come from (``store``, ``cache`` or ``remote``) and its size, if known."""
+        target = self.targets[rel]
+        if self.store is not None:
+            file_hash = self.store.lookup_url(target['source'])
+            if file_hash is not None:
+                return 'store', os.path.getsize(self.store.object_path(file_hash))
+
+        cache_path = cached_file_path(target['source'])
+        if cache_path is not None:
+            return 'cache', os.path.getsize(cache_path)
+
+        try:
+            resp = self.client.head(target['url'])
+        except httpx.HTTPError:
+            return 'remote', None
+        length = resp.headers.get('content-length')
+        return 'remote', int(length) if resp.status_code == 200 and length is not None else None
+
+    def plan(self) -> dict:
+        """
+        Resolves every target like ``run`` and reports, without transferring anything, how many files and bytes
+        would be downloaded, copied, skipped or deleted, and a rough duration estimate.
+        """
+        self.dry_run = True
+        package = self.options.package
+
+        try:
+            self.resolve()
+
+            if package:
+                pending, skip, delete = list(self.targets), [], []
+            else:
+                self.progress.set_stage('Checking')
+                change_set = self.manifest.diff(self.targets)
+                pending = change_set.copy + change_set.download + change_set.replace
+                skip, delete = change_set.skip, change_set.delete
+
+            downloads = [rel for rel in pending if self.targets[rel]['kind'] == 'download']
+            self.progress.set_stage('Estimating')
+            with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+                sizes = dict(zip(downloads, executor.map(self.download_size, downloads)))
+        finally:
+            self.close()
+
+        report = {
+            'download': {'files': 0, 'bytes': 0, 'unknown_size': 0},
+            'cached': {'files': 0, 'bytes': 0},
+            'copy': {'files': 0, 'bytes': 0},
+            'skip': {'files': len(skip), 'bytes': 0},
+            'delete': {'files': len(delete)},
+        }
+
+        for rel in pending:
+            target = self.targets[rel]
+            if target['kind'] == 'download':
+                origin, size = sizes[rel]
+                bucket = report['download'] if origin == 'remote' else report['cached']
+                if size is None:
+                    report['download']['unknown_size'] += 1
+                    size = 0
+            else:
+                bucket = report['copy']
+                size = len(target['data']) if target['kind'] == 'write' else os.path.getsize(target['source'])
+            bucket['files'] += 1
+            bucket['bytes'] += size
+
+        for rel in skip:
+            report['skip']['bytes'] += os.path.getsize(self.manifest.abs_path(rel))
+
+        report['estimated_seconds'] = (
+            report['download']['bytes'] / NETWORK_BYTES_PER_SECOND
+            + report['download']['files'] * REQUEST_LATENCY / DOWNLOAD_WORKERS
+            + (report['cached']['bytes'] + report['copy']['bytes']) / DISK_BYTES_PER_SECOND
+        )
+        self.progress.set_stage('Planned')
+        return report
+
+    def cancel(self) -> None:
+        self.progress.cancel()
+
+    def close(self) -> None:
+        if self._owns_client:
+            self.client.close()
+
+    def resolve(self) -> tuple[list, list, list]:
+        """Resolves every target; returns the story's models, images and snippets data."""
+        if not self.options.package:
+            self.manifest.load()
+
+        self.progress.set_stage('Resolving')
+        models_data = self.resolve_models()
+        if self.options.optimize_textures and not self.dry_run:
+            self.optimize_textures()
+        images_data = self.resolve_images()
+        snippets_data = self.resolve_snippets()
+        return models_data, images_data, snippets_data
+
+    def write(self, models_data: list, images_data: list, snippets_data: list) \
+            -> tuple[dict, list[tuple[int, str, str]]]:
+        """
+        Transfers the resolved targets and writes the story (or the package). Returns the story and the voice paths
+        to set on the snippets, ``(snippet index, voice as exported, path in voices/)``; the snippets belong to the
+        caller, so they are left for it to update.
+        """
+        if self.options.package:
+            # A package has no voices/ folder for the snippets to point at.
+            return self.write_package(models_data, images_data, snippets_data), []
+
+        self.progress.set_stage('Checking')
+        change_set = self.manifest.diff(self.targets)
+        logger.info('Export plan: %s', change_set)
+
+        self.progress.checkpoint()
+        hashes = self.apply(change_set)
+        story = self.build_story(models_data, images_data, snippets_data)
+
+        self.manifest.commit(self.targets, hashes)
+        self.manifest.save()
+        os.makedirs(os.path.join(self.base_path, 'voices'), exist_ok=True)
+        atomic_write(self.file_path, dump_story(story).encode('utf-8'))
+        return story, list(self._voice_updates)
+
+    def run(self) -> tuple[dict, list[tuple[int, str, str]]]:
+        """Resolves and writes the story; returns what ``write()`` does."""
+        try:
+            result = self.write(*self.resolve())
+        finally:
+            self.close()
+
+        self.progress.set_stage('Done')
+        return result
@@ -0,0 +1,250 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_SUFFIX = '.sekai-export-manifest.json'
+MANIFEST_VERSION = 1
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# hashlib releases the GIL on large buffers, so threads are enough to keep every core busy.
+HASH_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_files(paths, max_workers: int = HASH_WORKERS) -> dict[str, str]:
+    paths = list(dict.fromkeys(paths))
+    if len(paths) <= 1:
+        return {path: hash_file(path) for path in paths}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+        return dict(zip(paths, executor.map(hash_file, paths)))
+
+
+def stat_file(path: str) -> Optional[tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def same_path(a: str, b: str) -> bool:
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def manifest_path(story_path: str) -> str:
+    story_name = os.path.basename(story_path).split('.sekai-story.json')[0]
+    return os.path.join(os.path.dirname(story_path), f'.{story_name}{MANIFEST_SUFFIX}')
+
+
+class ChangeSet:
+    def __init__(self):
+        self.copy: list[str] = []
+        self.download: list[str] = []
+        self.replace: list[str] = []
+        self.delete: list[str] = []
+        self.skip: list[str] = []
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.copy or self.download or self.replace or self.delete)
+
+    def __str__(self):
+        return (f'{len(self.copy)} to copy, {len(self.download)} to download, {len(self.replace)} to replace, '
+                f'{len(self.delete)} to delete, {len(self.skip)} unchanged')
+
+
+class ExportManifest:
+    """
+    Records every file an export emitted (relative path -> hash, size, mtime and source), so the next export of the
+    same story only touches what changed.
+
+    Targets passed to ``diff`` and ``commit`` map a relative path to ``{"kind", "source"}``, where kind is ``copy``
+    (source is a local file), ``download`` (source is a URL) or ``write`` (the target also carries ``data`` bytes).
+    """
+
+    def __init__(self, story_path: str):
+        self.base_path = os.path.dirname(story_path)
+        self.path = manifest_path(story_path)
+        self.entries: dict[str, dict] = {}
+
+    def abs_path(self, rel: str) -> str:
+        return os.path.join(self.base_path, *rel.split('/'))
+
+    def load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION \
+                    or not isinstance(data.get('files'), dict):
+                raise ValueError('Invalid manifest structure')
+            self.entries = data['files']
+        except FileNotFoundError:
+            self.entries = {}
+        except (json.JSONDecodeError, ValueError):
+            logger.warning('%s corrupted, every file will be checked again.', self.path)
+            self.entries = {}
+
+    def save(self) -> None:
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.entries}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _claimed_by_others(self) -> set[str]:
+        claimed = set()
+        for path in glob.glob(os.path.join(glob.escape(self.base_path), f'.*{MANIFEST_SUFFIX}')):
+            if same_path(path, self.path):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    claimed.update(json.load(f).get('files', {}).keys())
+            except (OSError, json.JSONDecodeError, AttributeError):
+                continue
+        return claimed
+
+    def known_hashes(self) -> dict[str, tuple[int, int, str]]:
+        """Maps local paths this manifest knows the content of to ``(size, mtime, hash)``."""
+        known = {}
+        for rel, entry in self.entries.items():
+            known[os.path.normcase(os.path.abspath(self.abs_path(rel)))] = (entry['size'], entry['mtime'], entry['hash'])
+            if 'source_size' in entry:
+                known[os.path.normcase(os.path.abspath(entry['source']))] = \
+                    (entry['source_size'], entry['source_mtime'], entry['hash'])
+        return known
+
+    def diff(self, targets: dict[str, dict]) -> ChangeSet:
+        change_set = ChangeSet()
+        # rel -> (path to hash, expected hash or another path to compare with)
+        to_verify: dict[str, tuple[str, str]] = {}
+
+        for rel, target in targets.items():
+            dest = self.abs_path(rel)
+            dest_stat = stat_file(dest)
+            entry = self.entries.get(rel)
+            kind = target['kind']
+
+            if dest_stat is None:
+                (change_set.download if kind == 'download' else change_set.copy).append(rel)
+                continue
+
+            if kind == 'copy' and same_path(target['source'], dest):
+                change_set.skip.append(rel)
+                continue
+
+            untouched = entry is not None and entry['source'] == target['source'] \
+                and (entry['size'], entry['mtime']) == dest_stat
+
+            if kind == 'write':
+                if untouched and entry['hash'] == target['hash']:
+                    change_set.skip.append(rel)
+                else:
+                    to_verify[rel] = (dest, target['hash'])
+            elif kind == 'download':
+                if untouched:
+                    change_set.skip.append(rel)
+                elif entry is not None and entry['source'] == target['source'] and entry['size'] == dest_stat[0]:
+                    # Same content size but a different mtime, e.g. the folder was copied around.
+                    to_verify[rel] = (dest, entry['hash'])
+                else:
+                    change_set.replace.append(rel)
+            else:
+                source_stat = stat_file(target['source'])
+                if untouched and source_stat == (entry.get('source_size'), entry.get('source_mtime')):
+                    change_set.skip.append(rel)
+                else:
+                    to_verify[rel] = (dest, target['source'])
+
+        if to_verify:
+            paths = [dest for dest, _ in to_verify.values()]
+            paths.extend(expected for rel, (_, expected) in to_verify.items() if targets[rel]['kind'] == 'copy')
+            hashes = hash_files(paths)
+
+            for rel, (dest, expected) in to_verify.items():
+                if targets[rel]['kind'] == 'copy':
+                    expected = hashes[expected]
+                (change_set.skip if hashes[dest] == expected else change_set.replace).append(rel)
+
+        claimed = self._claimed_by_others()
+        change_set.delete = [rel for rel in self.entries if rel not in targets and rel not in claimed]
+
+        return change_set
+
+    def delete_stale(self, change_set: ChangeSet) -> None:
+        for rel in change_set.delete:
+            path = self.abs_path(rel)
+            if os.path.exists(path):
+                logger.info('Remove stale: %s', path)
+                os.remove(path)
+
+            parent = os.path.dirname(path)
+            while not same_path(parent, self.base_path):
+                try:
+                    os.rmdir(parent)
+                except OSError:
+                    break
+                parent = os.path.dirname(parent)
+
+    def commit(self, targets: dict[str, dict], hashes: Optional[dict[str, str]] = None, partial: bool = False) -> None:
+        """
+        Rebuilds the entries from the files that are now on disk for ``targets``. A partial commit (an interrupted
+        export) keeps the other entries, ``diff`` validates them again on the next run anyway.
+        """
+        hashes = dict(hashes or {})
+        entries = {}
+        missing = []
+
+        for rel, target in targets.items():
+            dest_stat = stat_file(self.abs_path(rel))
+            if dest_stat is None:
+                continue
+
+            old = self.entries.get(rel)
+            if rel not in hashes:
+                if target['kind'] == 'write':
+                    hashes[rel] = target['hash']
+                elif old is not None and (old['size'], old['mtime']) == dest_stat:
+                    hashes[rel] = old['hash']
+                else:
+                    missing.append(rel)
+
+            entry = {
+                'source': target['source'],
+                'size': dest_stat[0],
+                'mtime': dest_stat[1],
+            }
+            if target['kind'] == 'copy':
+                source_stat = stat_file(target['source'])
+                if source_stat is not None:
+                    entry['source_size'], entry['source_mtime'] = source_stat
+            entries[rel] = entry
+
+        if missing:
+            computed = hash_files([self.abs_path(rel) for rel in missing])
+            for rel in missing:
+                hashes[rel] = computed[self.abs_path(rel)]
+
+        for rel, entry in entries.items():
+            entry['hash'] = hashes[rel]
+
+        if partial:
+            self.entries.update(entries)
+        else:
+            self.entries = entries
@@ -0,0 +1,43 @@
+import json
+import os
+from dataclasses import dataclass, asdict, fields
+
+OPTIONS_PATH = "./cache/export_options.json"
+
+
+@dataclass
+class ExportOptions:
+    # Materialize files from the shared content store (see AssetStore) instead of copying them into every story.
+    use_asset_store: bool = False
+    # Resize and re-encode backgrounds in worker processes, see transcode_image.
+    optimize_images: bool = False
+    image_max_width: int = 1920
+    image_max_height: int = 1080
+    image_format: str = 'webp'
+    image_quality: int = 85
+    # Losslessly recompress model textures; a non-zero max size also halves them until they fit.
+    optimize_textures: bool = False
+    texture_max_size: int = 0
+    # Write a single .sekai-story.zip package instead of a story folder.
+    package: bool = False
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ExportOptions':
+        names = {field.name for field in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def load(cls, path: str = OPTIONS_PATH) -> 'ExportOptions':
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls.from_dict(json.load(f))
+        except (OSError, json.JSONDecodeError, TypeError, AttributeError):
+            return cls()
+
+    def save(self, path: str = OPTIONS_PATH) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,128 @@
+import threading
+import time
+from typing import Callable, Optional
+
+PROGRESS_INTERVAL = 0.1
+
+
+def format_bytes(size: float) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GB'
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f'{seconds // 3600}h {seconds % 3600 // 60}m'
+    if seconds >= 60:
+        return f'{seconds // 60}m {seconds % 60}s'
+    return f'{seconds}s'
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportProgress:
+    """
+    Thread-safe progress counters for one export. Reports are plain dicts so they can cross Qt signals and process
+    boundaries unchanged:
+
+    ``{"stage", "current", "files_done", "files_total", "bytes_done", "bytes_total", "throughput", "eta"}``
+
+    ``throughput`` is in bytes per second and ``eta`` in seconds (``None`` until it can be estimated).
+    """
+
+    def __init__(self, callback: Optional[Callable[[dict], None]] = None,
+                 cancel_event: Optional[threading.Event] = None):
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._last_report = 0.0
+        self._started = time.monotonic()
+
+        self.cancel_event = cancel_event or threading.Event()
+        self.stage = ''
+        self.current = ''
+        self.files_done = 0
+        self.files_total = 0
+        self.bytes_done = 0
+        self.bytes_total = 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def checkpoint(self) -> None:
+        if self.cancel_event.is_set():
+            raise ExportCancelled()
+
+    def set_stage(self, stage: str, current: str = '') -> None:
+        with self._lock:
+            self.stage = stage
+            self.current = current
+        self.report(force=True)
+
+    def start_transfer(self, files_total: int, bytes_total: int = 0) -> None:
+        with self._lock:
+            self._started = time.monotonic()
+            self.files_done = 0
+            self.files_total = files_total
+            self.bytes_done = 0
+            self.bytes_total = bytes_total
+        self.report(force=True)
+
+    def add_expected_bytes(self, n: int) -> None:
+        with self._lock:
+            self.bytes_total += n
+
+    def add_bytes(self, n: int) -> None:
+        with self._lock:
+            self.bytes_done += n
+        self.report()
+
+    def file_done(self, current: str = '') -> None:
+        with self._lock:
+            self.files_done += 1
+            if current:
+                self.current = current
+        self.report()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = max(time.monotonic() - self._started, 1e-6)
+            throughput = self.bytes_done / elapsed
+
+            eta = None
+            if self.files_done and self.files_total:
+                eta = elapsed / self.files_done * (self.files_total - self.files_done)
+            if throughput and self.bytes_total > self.bytes_done:
+                eta = max(eta or 0.0, (self.bytes_total - self.bytes_done) / throughput)
+
+            return {
+                'stage': self.stage,
+                'current': self.current,
+                'files_done': self.files_done,
+                'files_total': self.files_total,
+                'bytes_done': self.bytes_done,
+                'bytes_total': self.bytes_total,
+                'throughput': throughput,
+                'eta': eta,
+            }
+
+    def report(self, force: bool = False) -> None:
+        if self._callback is None:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_report < PROGRESS_INTERVAL:
+                return
+            self._last_report = now
+
+        self._callback(self.snapshot())
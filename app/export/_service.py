@@ -0,0 +1,222 @@
+import itertools
+import logging
+import queue
+import threading
+from typing import Callable, Hashable, Optional
+
+import httpx
+from httpx_retries import RetryTransport, Retry
+
+from ._progress import ExportCancelled
+
+logger = logging.getLogger(__name__)
+
+SERVICE_WORKERS = 2
+# Workers that only take interactive jobs, so loading a story never waits for running exports.
+INTERACTIVE_WORKERS = 1
+# Shared by every job, so TLS sessions and keep-alive connections survive from one save to the next.
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE_CONNECTIONS = 16
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_EXPORT = 10
+PRIORITY_PLAN = 20
+
+
+class ExportJob:
+    """
+    One unit of work for ``ExportService``. ``fn`` receives the job and should pass ``job.report`` and
+    ``job.cancel_event`` on to the exporter it runs. Listeners are called from the worker thread.
+    """
+
+    def __init__(self, key: Hashable, fn: Callable[['ExportJob'], object], priority: int):
+        self.key = key
+        self.fn = fn
+        self.priority = priority
+        self.cancel_event = threading.Event()
+        self.state = 'pending'  # pending | running | finished | failed | canceled
+        self.result = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._listeners: list[dict] = []
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def subscribe(self, on_progress=None, on_finished=None, on_failed=None, on_canceled=None) -> None:
+        listener = {'progress': on_progress, 'finished': on_finished, 'failed': on_failed, 'canceled': on_canceled}
+        with self._lock:
+            if not self._done.is_set():
+                self._listeners.append(listener)
+                return
+        self._notify(listener)
+
+    def report(self, progress: dict) -> None:
+        with self._lock:
+            callbacks = [listener['progress'] for listener in self._listeners if listener['progress']]
+        for callback in callbacks:
+            callback(progress)
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+        with self._lock:
+            if self.state != 'pending':
+                return
+        # Not started yet, so nothing else will finish it.
+        self._finish('canceled')
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _start(self) -> bool:
+        with self._lock:
+            if self.state != 'pending' or self.cancel_event.is_set():
+                return False
+            self.state = 'running'
+            return True
+
+    def _finish(self, state: str, result=None, error: Optional[str] = None) -> None:
+        with self._lock:
+            if self._done.is_set():
+                return
+            self.state = state
+            self.result = result
+            self.error = error
+            self._done.set()
+            listeners, self._listeners = self._listeners, []
+        for listener in listeners:
+            self._notify(listener)
+
+    def _notify(self, listener: dict) -> None:
+        if self.state == 'finished' and listener['finished']:
+            listener['finished'](self.result)
+        elif self.state == 'failed' and listener['failed']:
+            listener['failed'](self.error)
+        elif self.state == 'canceled' and listener['canceled']:
+            listener['canceled']()
+
+    def run(self) -> None:
+        try:
+            result = self.fn(self)
+        except ExportCancelled:
+            logger.info('Canceled')
+            self._finish('canceled')
+        except Exception as e:
+            logger.exception('Export job failed')
+            self._finish('failed', error=str(e))
+        else:
+            self._finish('finished', result)
+
+
+class ExportService:
+    """
+    Long-lived background service for exports and downloads. A bounded pool of worker threads takes jobs from one
+    priority queue (lower runs first) and shares one pooled ``httpx.Client``. Priority only orders jobs that are
+    still waiting, so interactive jobs are also queued for workers of their own and run even while every other
+    worker is busy with an export.
+
+    Jobs are identified by ``key``: submitting a key that is still queued attaches the new listeners to the queued
+    job instead of running the work twice, and a job whose key is already running waits until that run is over,
+    so two saves of the same story never write at the same time.
+    """
+
+    def __init__(self, workers: int = SERVICE_WORKERS, interactive_workers: int = INTERACTIVE_WORKERS):
+        self.client = httpx.Client(
+            transport=RetryTransport(retry=Retry(total=10, backoff_factor=0.5)),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS),
+        )
+        self._workers = workers
+        self._interactive_workers = interactive_workers
+        self._threads: list[threading.Thread] = []
+        self._interactive_threads: list[threading.Thread] = []
+        self._queue = queue.PriorityQueue()
+        self._interactive_queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._queued: dict[Hashable, ExportJob] = {}
+        self._running: dict[Hashable, ExportJob] = {}
+        self._parked: dict[Hashable, list[ExportJob]] = {}
+        self._closed = False
+
+    def submit(self, key: Hashable, fn: Callable[[ExportJob], object], priority: int = PRIORITY_EXPORT,
+               **listeners) -> ExportJob:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('The export service is shut down')
+
+            job = self._queued.get(key)
+            if job is not None and job.state == 'pending':
+                job.subscribe(**listeners)
+                if priority < job.priority:
+                    # Queue it again at the better priority, the stale entry is skipped.
+                    job.priority = priority
+                    self._enqueue(job)
+                return job
+
+            job = ExportJob(key, fn, priority)
+            job.subscribe(**listeners)
+            self._queued[key] = job
+            self._enqueue(job)
+        return job
+
+    def _enqueue(self, job: ExportJob) -> None:
+        # Called with the lock held. A job queued twice runs once; whichever worker comes second skips it.
+        self._queue.put((job.priority, next(self._order), job))
+        self._start_worker(self._threads, self._workers, self._queue, 'ExportService')
+        if job.priority <= PRIORITY_INTERACTIVE:
+            self._interactive_queue.put((job.priority, next(self._order), job))
+            self._start_worker(self._interactive_threads, self._interactive_workers, self._interactive_queue,
+                               'ExportService-interactive')
+
+    def _start_worker(self, threads: list[threading.Thread], limit: int, jobs: queue.PriorityQueue,
+                      name: str) -> None:
+        if len(threads) < limit:
+            thread = threading.Thread(target=self._work, args=(jobs,), name=f'{name}-{len(threads)}', daemon=True)
+            threads.append(thread)
+            thread.start()
+
+    def _work(self, jobs: queue.PriorityQueue) -> None:
+        while True:
+            _, _, job = jobs.get()
+            if job is None:
+                return
+
+            with self._lock:
+                if job.state != 'pending':
+                    continue
+                if job.key in self._running:
+                    parked = self._parked.setdefault(job.key, [])
+                    if job not in parked:
+                        parked.append(job)
+                    continue
+                if self._queued.get(job.key) is job:
+                    del self._queued[job.key]
+                if not job._start():
+                    continue
+                self._running[job.key] = job
+
+            try:
+                job.run()
+            finally:
+                with self._lock:
+                    del self._running[job.key]
+                    for parked in self._parked.pop(job.key, []):
+                        self._enqueue(parked)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            self._closed = True
+            jobs = [*self._queued.values(), *self._running.values()]
+            jobs.extend(job for parked in self._parked.values() for job in parked)
+        for job in jobs:
+            job.cancel()
+
+        for threads, job_queue in ((self._threads, self._queue), (self._interactive_threads, self._interactive_queue)):
+            for _ in threads:
+                job_queue.put((float('inf'), next(self._order), None))
+        for thread in [*self._threads, *self._interactive_threads]:
+            thread.join(timeout)
+        self.client.close()
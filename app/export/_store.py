@@ -0,0 +1,211 @@
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from typing import Optional
+
+from ._download import download_file, PART_SUFFIX
+from ._manifest import hash_file, hash_bytes, stat_file
+from ._progress import ExportProgress
+
+STORE_DIR = "./cache/store/"
+STORE_INDEX_NAME = "url_index.json"
+
+# A fetch lock older than this was left behind by an export that crashed.
+LOCK_STALE_SECONDS = 600
+
+_FICLONE = 0x40049409
+
+
+def _reflink(source: str, dest: str) -> bool:
+    if sys.platform.startswith('linux'):
+        import fcntl
+
+        try:
+            with open(source, 'rb') as src, open(dest, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            return True
+        except OSError:
+            if os.path.exists(dest):
+                os.remove(dest)
+            return False
+
+    if sys.platform == 'darwin':
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        clonefile = getattr(libc, 'clonefile', None)
+        if clonefile is None:
+            return False
+        return clonefile(os.fsencode(source), os.fsencode(dest), 0) == 0
+
+    return False
+
+
+def _try_lock(path: str) -> bool:
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(path) < LOCK_STALE_SECONDS:
+                return False
+            os.remove(path)
+        except OSError:
+            return False
+        return _try_lock(path)
+    os.close(fd)
+    return True
+
+
+class AssetStore:
+    """
+    Content-addressed store shared by every exported story. Objects live at ``<root>/objects/<hash[:2]>/<hash>`` and
+    are materialized into story folders as reflinks (copy-on-write clones) or hardlinks where the filesystem supports
+    them, falling back to a plain copy. ``url_index.json`` remembers which object a URL resolved to, so assets that
+    are already in the store are never downloaded again.
+
+    Exported files that are hardlinks share their content with the store, which is why export targets are always
+    replaced through a rename instead of being written in place.
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        self.index_path = os.path.join(root, STORE_INDEX_NAME)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._link_mode: Optional[str] = None
+        # (path, size, mtime) -> hash of files already put, so a file shared by several stories is hashed once.
+        self._file_hashes: dict[tuple, str] = {}
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.url_index = self._read_index()
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            return index if isinstance(index, dict) else {}
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def save_index(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            # Other exports may share the store, keep what they added meanwhile.
+            index = {**self._read_index(), **self.url_index}
+            tmp_path = f'{self.index_path}.{uuid.uuid4().hex}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+            self.url_index = index
+            self._dirty = False
+
+    def object_path(self, file_hash: str) -> str:
+        return os.path.join(self.objects_dir, file_hash[:2], file_hash)
+
+    def has(self, file_hash: str) -> bool:
+        return os.path.exists(self.object_path(file_hash))
+
+    def lookup_url(self, url: str) -> Optional[str]:
+        with self._lock:
+            file_hash = self.url_index.get(url)
+        return file_hash if file_hash and self.has(file_hash) else None
+
+    def _remember_url(self, url: str, file_hash: str) -> None:
+        with self._lock:
+            self.url_index[url] = file_hash
+            self._dirty = True
+
+    def _adopt(self, tmp_path: str, file_hash: str) -> str:
+        object_path = self.object_path(file_hash)
+        if os.path.exists(object_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(tmp_path, object_path)
+        return file_hash
+
+    def _tmp_path(self) -> str:
+        return os.path.join(self.tmp_dir, uuid.uuid4().hex)
+
+    def put_file(self, path: str, file_hash: Optional[str] = None) -> str:
+        key = (os.path.normcase(os.path.abspath(path)), stat_file(path))
+        file_hash = file_hash or self._file_hashes.get(key) or hash_file(path)
+        self._file_hashes[key] = file_hash
+        if self.has(file_hash):
+            return file_hash
+
+        tmp_path = self._tmp_path()
+        shutil.copyfile(path, tmp_path)
+        return self._adopt(tmp_path, file_hash)
+
+    def put_bytes(self, data: bytes) -> str:
+        file_hash = hash_bytes(data)
+        if self.has(file_hash):
+            return file_hash
+
+        tmp_path = self._tmp_path()
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        return self._adopt(tmp_path, file_hash)
+
+    def fetch(self, client, url: str, cache_key: str, progress: Optional[ExportProgress] = None) -> str:
+        file_hash = self.lookup_url(cache_key)
+        if file_hash is not None:
+            return file_hash
+
+        # A stable part name per URL, so an interrupted download resumes next time. While another thread or
+        # process (e.g. a parallel headless export) holds that name, download to a private one instead.
+        stable_path = os.path.join(self.tmp_dir, hash_bytes(cache_key.encode('utf-8')))
+        lock_path = stable_path + '.lock'
+        locked = _try_lock(lock_path)
+        tmp_path = stable_path if locked else self._tmp_path()
+        try:
+            try:
+                file_hash, _ = download_file(client, url, tmp_path, progress)
+            except BaseException:
+                if not locked and os.path.exists(tmp_path + PART_SUFFIX):
+                    os.remove(tmp_path + PART_SUFFIX)
+                raise
+            # Still under the lock: until the file is moved into the store, another fetch of the URL would
+            # download over it.
+            self._adopt(tmp_path, file_hash)
+            self._remember_url(cache_key, file_hash)
+        finally:
+            if locked:
+                os.remove(lock_path)
+        return file_hash
+
+    def materialize(self, file_hash: str, dest: str) -> str:
+        """Places the object at ``dest`` (atomically) and returns how: ``reflink``, ``hardlink`` or ``copy``."""
+        object_path = self.object_path(file_hash)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        part_path = dest + PART_SUFFIX
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+        mode = None
+        if self._link_mode in (None, 'reflink') and _reflink(object_path, part_path):
+            mode = 'reflink'
+        elif self._link_mode in (None, 'reflink', 'hardlink'):
+            try:
+                os.link(object_path, part_path)
+                mode = 'hardlink'
+            except OSError:
+                pass
+
+        if mode is None:
+            shutil.copyfile(object_path, part_path)
+            mode = 'copy'
+
+        # Remember the first mode that worked so later files skip the failing attempts.
+        self._link_mode = self._link_mode or mode
+        os.replace(part_path, dest)
+        return mode
@@ -0,0 +1,85 @@
+import os
+import shutil
+import uuid
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+DERIVED_DIR = "./cache/derived/"
+# Bump whenever the encoder settings below change, so cached results are not reused.
+TRANSCODE_VERSION = 1
+
+IMAGE_FORMATS = {
+    'webp': ('WEBP', '.webp'),
+    'jpeg': ('JPEG', '.jpg'),
+    'png': ('PNG', '.png'),
+}
+
+
+def is_available() -> bool:
+    return Image is not None
+
+
+def derived_path(key: str, ext: str) -> str:
+    return os.path.join(DERIVED_DIR, key[:2], key + ext)
+
+
+def _save_atomic(image, dest: str, **params) -> None:
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp_path = f'{dest}.{uuid.uuid4().hex}.tmp'
+    image.save(tmp_path, **params)
+    os.replace(tmp_path, dest)
+
+
+def transcode_image(source: str, dest: str, max_width: int, max_height: int, image_format: str, quality: int) -> str:
+    """Runs in a worker process: fits ``source`` into ``max_width`` x ``max_height`` and re-encodes it to ``dest``."""
+    pil_format, _ = IMAGE_FORMATS[image_format]
+
+    with Image.open(source) as image:
+        image.load()
+        if image.width > max_width or image.height > max_height:
+            image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+        if pil_format == 'JPEG':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        if pil_format == 'PNG':
+            _save_atomic(image, dest, format=pil_format, optimize=True)
+        elif pil_format == 'WEBP':
+            _save_atomic(image, dest, format=pil_format, quality=quality, method=6)
+        else:
+            _save_atomic(image, dest, format=pil_format, quality=quality, optimize=True, progressive=True)
+
+    return dest
+
+
+def recompress_texture(source: str, dest: str, max_size: int) -> str:
+    """
+    Runs in a worker process: recompresses a model texture as an optimized PNG. With ``max_size`` the texture is
+    halved until it fits, which keeps power-of-two atlases power-of-two; UVs are normalized, so models are unaffected.
+    """
+    with Image.open(source) as image:
+        image.load()
+        resized = False
+        if max_size and max(image.size) > max_size:
+            factor = 2
+            while max(image.width, image.height) // factor > max_size:
+                factor *= 2
+            image = image.resize((max(1, image.width // factor), max(1, image.height // factor)),
+                                 Image.Resampling.LANCZOS)
+            resized = True
+
+        _save_atomic(image, dest, format='PNG', optimize=True)
+
+    if not resized and os.path.getsize(dest) >= os.path.getsize(source):
+        # The original encoder already did better, keep its bytes.
+        tmp_path = f'{dest}.{uuid.uuid4().hex}.tmp'
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, dest)
+
+    return dest
@@ -0,0 +1,198 @@
+import json
+import os
+import posixpath
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from ._exporter import model_referenced_files, package_story_name
+from ._manifest import ExportManifest, hash_bytes
+
+VERIFY_WORKERS = 8
+
+# extension -> (offset, magic) pairs that must all match
+SIGNATURES = {
+    '.png': [(0, b'\x89PNG\r\n\x1a\n')],
+    '.jpg': [(0, b'\xff\xd8\xff')],
+    '.jpeg': [(0, b'\xff\xd8\xff')],
+    '.gif': [(0, b'GIF8')],
+    '.webp': [(0, b'RIFF'), (8, b'WEBP')],
+    '.avif': [(4, b'ftyp')],
+    '.ogg': [(0, b'OggS')],
+    '.wav': [(0, b'RIFF'), (8, b'WAVE')],
+    '.moc3': [(0, b'MOC3')],
+}
+
+
+def check_content(rel: str, data: bytes) -> Optional[str]:
+    """Returns why ``data`` cannot be what its name says it is, or ``None``."""
+    ext = posixpath.splitext(rel)[1].lower()
+    if ext == '.json':
+        try:
+            json.loads(data)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            return f'invalid JSON: {e}'
+    for offset, magic in SIGNATURES.get(ext, []):
+        if data[offset:offset + len(magic)] != magic:
+            return f'not a valid {ext[1:]} file'
+    return None
+
+
+class _FolderReader:
+    def __init__(self, story_path: str):
+        self.manifest = ExportManifest(story_path)
+        self.manifest.load()
+        self.story_rel = os.path.basename(story_path)
+
+    def read(self, rel: str) -> Optional[bytes]:
+        try:
+            with open(self.manifest.abs_path(rel), 'rb') as f:
+                return f.read()
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+
+    def expected_hash(self, rel: str) -> Optional[str]:
+        entry = self.manifest.entries.get(rel)
+        return entry['hash'] if entry else None
+
+    def close(self) -> None:
+        pass
+
+
+class _PackageReader:
+    def __init__(self, package_path: str):
+        self.archive = zipfile.ZipFile(package_path)
+        self.story_rel = package_story_name(package_path)
+
+    def read(self, rel: str) -> Optional[bytes]:
+        try:
+            # Reading also checks the entry's CRC.
+            return self.archive.read(rel)
+        except KeyError:
+            return None
+
+    def expected_hash(self, rel: str) -> Optional[str]:
+        return None
+
+    def close(self) -> None:
+        self.archive.close()
+
+
+def verify_export(path: str, workers: int = VERIFY_WORKERS) -> dict:
+    """
+    Checks an exported story folder (given its ``.sekai-story.json``) or package: every model json and the files it
+    references, every image and every voice must exist and decode, and match the hash the export manifest recorded.
+    Returns a JSON-serializable report; ``ok`` is true when ``errors`` is empty.
+    """
+    started = time.monotonic()
+    reader = _PackageReader(path) if zipfile.is_zipfile(path) else _FolderReader(path)
+    lock = threading.Lock()
+    errors = []
+    checked = {'files': 0, 'bytes': 0, 'hashed': 0}
+
+    def fail(rel: str, kind: str, error: str) -> None:
+        with lock:
+            errors.append({'path': rel, 'kind': kind, 'error': error})
+
+    def check(rel: str, kind: str) -> Optional[bytes]:
+        try:
+            data = reader.read(rel)
+        except (zipfile.BadZipFile, zlib.error, EOFError) as e:
+            # A package entry that fails its CRC or does not inflate.
+            fail(rel, kind, f'corrupt: {e}')
+            return None
+        if data is None:
+            fail(rel, kind, 'missing')
+            return None
+
+        problem = check_content(rel, data)
+        expected = reader.expected_hash(rel)
+        if problem is None and expected is not None and hash_bytes(data) != expected:
+            problem = 'hash does not match the export manifest'
+
+        with lock:
+            checked['files'] += 1
+            checked['bytes'] += len(data)
+            checked['hashed'] += expected is not None
+        if problem is not None:
+            fail(rel, kind, problem)
+            return None
+        return data
+
+    def story_entries(story: dict, key: str) -> list[tuple[int, dict]]:
+        # Entries of one of the story's lists that are objects; anything else is reported, not raised.
+        value = story.get(key, [])
+        if not isinstance(value, list):
+            fail(reader.story_rel, 'story', f'{key} is not a list')
+            return []
+        entries = []
+        for index, entry in enumerate(value):
+            if isinstance(entry, dict):
+                entries.append((index, entry))
+            else:
+                fail(reader.story_rel, 'story', f'{key}[{index}] is not an object')
+        return entries
+
+    try:
+        story_data = check(reader.story_rel, 'story')
+        story = json.loads(story_data) if story_data is not None else None
+        if story is not None and not isinstance(story, dict):
+            fail(reader.story_rel, 'story', 'not a story object')
+            story = None
+        if story is not None:
+            model_rels = []
+            for index, model in story_entries(story, 'models'):
+                if isinstance(model.get('model'), str) and model['model']:
+                    model_rels.append(posixpath.normpath(f"models/{model['model']}"))
+                else:
+                    fail(reader.story_rel, 'story', f'models[{index}] has no model path')
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                model_jsons = list(executor.map(lambda rel: check(rel, 'model'), model_rels))
+
+            files = {}
+            for rel, data in zip(model_rels, model_jsons):
+                if data is None:
+                    continue
+                model_data = json.loads(data)
+                if not isinstance(model_data, dict):
+                    fail(rel, 'model', 'not a model object')
+                    continue
+                try:
+                    refs = model_referenced_files(model_data)
+                except (AttributeError, TypeError) as e:
+                    fail(rel, 'model', f'unexpected model layout: {e}')
+                    continue
+                model_dir = posixpath.dirname(rel)
+                for ref in refs:
+                    files.setdefault(posixpath.normpath(f'{model_dir}/{ref}'), 'model file')
+            for index, image in story_entries(story, 'images'):
+                if isinstance(image.get('image'), str) and image['image']:
+                    files.setdefault(f"images/{image['image']}", 'image')
+                else:
+                    fail(reader.story_rel, 'story', f'images[{index}] has no image file')
+            for index, snippet in story_entries(story, 'snippets'):
+                data = snippet.get('data')
+                voice = data.get('voice') if isinstance(data, dict) else None
+                if isinstance(voice, str) and voice:
+                    files.setdefault(f'voices/{voice}', 'voice')
+                elif voice:
+                    fail(reader.story_rel, 'story', f'snippets[{index}] has a voice that is not a file name')
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(lambda item: check(*item), files.items()))
+    finally:
+        reader.close()
+
+    errors.sort(key=lambda error: error['path'])
+    return {
+        'story': path,
+        'ok': not errors,
+        'files': checked['files'],
+        'bytes': checked['bytes'],
+        'hash_checked': checked['hashed'],
+        'errors': errors,
+        'seconds': round(time.monotonic() - started, 3),
+    }
@@ -0,0 +1,22 @@
+from PySide6.QtCore import QObject, Signal
+
+
+class JobSignals(QObject):
+    """Forwards the listener callbacks of an ``ExportJob`` (called on a worker thread) as queued Qt signals."""
+    progress = Signal(dict)
+    finished = Signal(object)
+    failed = Signal(str)
+    canceled = Signal()
+
+    def listen(self) -> dict:
+        """Listener keyword arguments for ``ExportService.submit``; call it after connecting the signals."""
+        # Connected last, so the handlers connected before run before this object goes away.
+        for signal in (self.finished, self.failed, self.canceled):
+            signal.connect(self.deleteLater)
+
+        return {
+            'on_progress': self.progress.emit,
+            'on_finished': self.finished.emit,
+            'on_failed': self.failed.emit,
+            'on_canceled': self.canceled.emit,
+        }
@@ -3,6 +3,7 @@ import os
 import socket
 import time
 from threading import Thread
+from typing import Optional
 from urllib.parse import unquote_plus, quote_plus
 
 import httpx
@@ -30,6 +31,20 @@ CACHE_MAP_PATH = os.path.join(CACHE_DIR, "cache_map.json")
 CACHE_EXPIRE_SECONDS = 15 * 24 * 3600
 
 
+def cached_file_path(url: str) -> Optional[str]:
+    """Returns the cached body of an upstream URL if the caching server has one, without touching the network."""
+    try:
+        with open(CACHE_MAP_PATH, "r", encoding="utf-8") as f:
+            cache_entry = json.load(f).get(calculate_md5_string(unquote_plus(url)))
+    except (OSError, json.JSONDecodeError, AttributeError):
+        return None
+
+    if not cache_entry:
+        return None
+    cache_path = os.path.join(CACHE_DIR, f"{cache_entry['etag']}.cache")
+    return cache_path if os.path.exists(cache_path) else None
+
+
 class FastAPIServer:
     def __init__(self, host: str = "127.0.0.1", port: int = 0):
         self.host = host
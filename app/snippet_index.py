@@ -0,0 +1,127 @@
+import re
+from typing import Iterable, Optional
+
+from app.snippets import BaseSnippet
+
+# Searchable field -> its key in a snippet's ``data``; ``type`` is the snippet type itself.
+SEARCH_FIELDS = {
+    'type': None,
+    'speaker': 'speaker',
+    'content': 'content',
+    'modelId': 'modelId',
+    'motion': 'motion',
+    'facial': 'facial',
+    'voice': 'voice',
+}
+
+# Fields find-and-replace edits by default: the text a writer types.
+REPLACE_FIELDS = ('speaker', 'content')
+
+
+def compile_find_pattern(find: str, regex: bool = False, case_sensitive: bool = False) -> re.Pattern:
+    """The pattern for a find query; raises ``re.error`` for an invalid regex."""
+    return re.compile(find if regex else re.escape(find), 0 if case_sensitive else re.IGNORECASE)
+
+
+class SnippetIndex:
+    """
+    Search over a story's snippets. Each snippet's entry is cached on the snippet and read again only when its
+    version has moved on, so a query over a large story re-reads just the snippets edited since the last one.
+    """
+
+    @staticmethod
+    def _extract(snippet: BaseSnippet) -> tuple[dict[str, str], str]:
+        data = snippet.properties.get('data')
+        if not isinstance(data, dict):
+            data = {}
+        fields = {}
+        for field, key in SEARCH_FIELDS.items():
+            value = snippet.type if key is None else data.get(key)
+            if value is None or value == '':
+                continue
+            fields[field] = str(value).casefold()
+        # Every field in one string, for queries that are not limited to a field.
+        return fields, '\n'.join(fields.values())
+
+    def entry(self, snippet: BaseSnippet) -> tuple[dict[str, str], str]:
+        """``(case-folded fields, all fields joined)`` for ``snippet``, rebuilt if it changed."""
+        cached = snippet.index_entry
+        if cached is None or cached[0] != snippet.version:
+            cached = snippet.index_entry = (snippet.version, *self._extract(snippet))
+        return cached[1], cached[2]
+
+    def search(self, snippets: list[BaseSnippet], text: str = '', field: Optional[str] = None,
+               types: Optional[Iterable[str]] = None) -> list[int]:
+        """
+        Rows of ``snippets`` whose ``field`` (any field if ``None``) contains ``text``, case-insensitively, limited to
+        the snippet ``types`` when given. ``modelId`` is matched exactly.
+        """
+        text = text.casefold()
+        types = set(types) if types else None
+        if not text:
+            matches = lambda fields, joined: True
+        elif field is None:
+            matches = lambda fields, joined: text in joined
+        elif field == 'modelId':
+            text = text.strip()
+            matches = lambda fields, joined: fields.get('modelId') == text
+        else:
+            matches = lambda fields, joined: text in fields.get(field, '')
+
+        rows = []
+        for row, snippet in enumerate(snippets):
+            if types is not None and snippet.type not in types:
+                continue
+            if matches(*self.entry(snippet)):
+                rows.append(row)
+        return rows
+
+    def preview(self, snippet: BaseSnippet) -> str:
+        """A one-line summary of the snippet for result lists."""
+        data = snippet.properties.get('data') or {}
+        parts = [str(data[key]) for key in ('speaker', 'content') if data.get(key)]
+        if not parts:
+            parts = [str(data[key]) for key in ('motion', 'facial', 'voice') if data.get(key)]
+        return ': '.join(parts).replace('\n', ' ')
+
+    def find_replacements(self, snippets: list[BaseSnippet], find: str, replacement: str, regex: bool = False,
+                          case_sensitive: bool = False, fields: Iterable[str] = REPLACE_FIELDS,
+                          types: Optional[Iterable[str]] = None) -> list[dict]:
+        """
+        Every string field that replacing ``find`` with ``replacement`` would touch, as
+        ``{"row", "snippet", "path", "old", "new", "count"}``; nothing is changed. With ``regex``, ``find`` is a
+        regular expression and ``replacement`` may use group references, otherwise both are taken literally.
+        Raises ``re.error`` for an invalid regex.
+        """
+        pattern = compile_find_pattern(find, regex, case_sensitive)
+        template = replacement if regex else (lambda match: replacement)
+        # A literal query must appear, case-folded, in the indexed field, so other snippets are skipped unread.
+        needle = None if regex else find.casefold()
+        fields = tuple(fields)
+        types = set(types) if types else None
+
+        changes = []
+        for row, snippet in enumerate(snippets):
+            if types is not None and snippet.type not in types:
+                continue
+            indexed, _ = self.entry(snippet)
+            for field in fields:
+                if field not in indexed or (needle is not None and needle not in indexed[field]):
+                    continue
+                key = SEARCH_FIELDS[field]
+                old = snippet.properties['data'][key]
+                if not isinstance(old, str):
+                    continue
+                new, count = pattern.subn(template, old)
+                if count:
+                    changes.append({'row': row, 'snippet': snippet, 'path': f'data.{key}', 'old': old, 'new': new,
+                                    'count': count})
+        return changes
+
+
+def apply_replacements(changes: list[dict]) -> int:
+    """Writes the changes from ``find_replacements``; returns the number of matches replaced."""
+    for change in changes:
+        if change['new'] != change['old']:
+            change['snippet'].set_property(change['path'], change['new'])
+    return sum(change['count'] for change in changes)
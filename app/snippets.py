@@ -1,8 +1,8 @@
 import copy
-import enum
 from enum import Enum
+from functools import lru_cache
 import re
-from app.utils import to_ordered_dict
+from typing import Callable
 
 
 NEW_LINE_KEYWORDS = [
@@ -34,10 +34,58 @@ class Curves(Enum):
     Cosine = 'Cosine'
 
 
+def _list_index(key: str):
+    try:
+        return int(key)
+    except ValueError:
+        return None
+
+
+class PropertyPath:
+    """A dotted property path such as ``data.params.0.end``, split and with its list indices parsed once."""
+    __slots__ = ('parents', 'key', 'index')
+
+    def __init__(self, path: str):
+        keys = path.split('.')
+        self.parents = tuple((key, _list_index(key)) for key in keys[:-1])
+        self.key = keys[-1]
+        self.index = _list_index(self.key)
+
+    def container(self, properties: dict):
+        """The dict or list holding the path's last key, or ``None`` if the path does not exist."""
+        current = properties
+        for key, index in self.parents:
+            if isinstance(current, dict) and key in current:
+                current = current[key]
+            elif isinstance(current, list) and index is not None:
+                try:
+                    current = current[index]
+                except IndexError:
+                    return None
+            else:
+                return None
+        return current
+
+
+@lru_cache(maxsize=1024)
+def property_path(path: str) -> PropertyPath:
+    return PropertyPath(path)
+
+
 class BaseSnippet:
+    __slots__ = ('_type', 'version', '_built', '_properties', 'index_entry')
+
+    # Property paths holding user text, the only strings the newline keywords are replaced in on build.
+    text_fields: tuple[str, ...] = ()
+
     def __init__(self, snippet_type: str, properties: dict):
         self._type = snippet_type
-        self.properties: dict = {
+        # Bumped on every change; build() keeps its result until the version moves on.
+        self.version = 0
+        self._built = None
+        # Search fields cached by SnippetIndex, tagged with the version they were read from.
+        self.index_entry = None
+        self.properties = {
             'wait': True,
             'delay': float(0)
         }
@@ -48,125 +96,119 @@ class BaseSnippet:
     def type(self):
         return self._type
 
-    def _get_obj_and_key(self, path):
-        keys = path.split('.') if '.' in path else [path]
-        current = self.properties
+    @property
+    def properties(self) -> dict:
+        return self._properties
 
-        for i, k in enumerate(keys[:-1]):
-            if isinstance(current, dict) and k in current:
-                current = current[k]
-            elif isinstance(current, list):
-                try:
-                    idx = int(k)
-                    current = current[idx]
-                except:
-                    return None, None
-            else:
-                return None, None
+    @properties.setter
+    def properties(self, value: dict):
+        self._properties = value
+        self.touch()
+
+    def touch(self):
+        """Marks the snippet as changed. Needed only after mutating ``properties`` in place."""
+        self.version += 1
 
-        return current, keys[-1]
+    def _get_obj_and_key(self, path):
+        accessor = property_path(path)
+        return accessor.container(self._properties), accessor.key
 
     def set_property(self, key, value):
-        obj, last_key = self._get_obj_and_key(key)
-        if obj is not None:
-            if isinstance(obj, dict):
-                obj[last_key] = value
-            elif isinstance(obj, list):
-                try:
-                    idx = int(last_key)
-                    if 0 <= idx < len(obj):
-                        obj[idx] = value
-                except:
-                    pass
+        accessor = property_path(key)
+        obj = accessor.container(self._properties)
+        if isinstance(obj, dict):
+            obj[accessor.key] = value
+            self.touch()
+        elif isinstance(obj, list):
+            idx = accessor.index
+            if idx is not None and 0 <= idx < len(obj):
+                obj[idx] = value
+                self.touch()
+
+    def get_property(self, key, default=None):
+        accessor = property_path(key)
+        obj = accessor.container(self._properties)
+        if isinstance(obj, dict):
+            return obj.get(accessor.key, default)
+        if isinstance(obj, list) and accessor.index is not None and 0 <= accessor.index < len(obj):
+            return obj[accessor.index]
+        return default
 
     def add_list_item(self, key):
         obj, last_key = self._get_obj_and_key(key)
         if obj is not None and isinstance(obj, dict) and isinstance(obj[last_key], list):
             new_item = self.get_default_item(last_key)
             obj[last_key].append(new_item)
+            self.touch()
+            return new_item
+
+    def insert_list_item(self, key, index, item):
+        obj, last_key = self._get_obj_and_key(key)
+        if obj is not None and isinstance(obj, dict) and isinstance(obj.get(last_key), list):
+            obj[last_key].insert(index, item)
+            self.touch()
 
     def remove_list_item(self, key, index):
         obj, last_key = self._get_obj_and_key(key)
         if obj is not None and isinstance(obj, dict):
             lst = obj[last_key]
             if isinstance(lst, list) and 0 <= index < len(lst):
-                lst.pop(index)
+                item = lst.pop(index)
+                self.touch()
+                return item
 
     def get_default_item(self, key: str):
         return {}
 
+    @classmethod
+    def from_properties(cls, snippet_type: str, properties: dict):
+        """An instance holding ``properties`` as they are, without building the type's defaults."""
+        snippet = cls.__new__(cls)
+        snippet._type = snippet_type
+        snippet.version = 0
+        snippet._built = None
+        snippet.index_entry = None
+        snippet._properties = properties
+        return snippet
+
     def copy(self):
-        new_properties = copy.deepcopy(self.properties)
-        new_snippet = self.__class__.__new__(self.__class__)
-        # Hacky init to bypass __init__ logic, then overwrite props
-        if hasattr(new_snippet, '__init__'):
-            # We need to call init to set basic attrs if any, but safely
-            pass
-
-            # Use fresh init based on type if possible, else direct copy
-        if self._type == 'DoParam':
-            return DoParamSnippet(
-                model_id=new_properties['data']['modelId'],
-                params=new_properties['data']['params']
-            )
-
-        # Fallback generic copy
-        new_snippet = BaseSnippet(self._type, {})
-        new_snippet.properties = new_properties
-        return new_snippet
+        return self.from_properties(self._type, copy.deepcopy(self._properties))
 
     def build(self) -> dict:
-        def process_data(data_dict: dict):
-            result = {}
-            for key, value in data_dict.items():
-                if isinstance(value, str):
-                    for keyword in NEW_LINE_KEYWORDS:
-                        value = keyword.sub('\n', value)
-                if isinstance(value, dict):
-                    result[key] = process_data(value)
-                elif isinstance(value, list):
-                    new_list = []
-                    for item in value:
-                        if isinstance(item, dict):
-                            new_list.append(process_data(item))
-                        elif isinstance(item, enum.Enum):
-                            new_list.append(item.value)
-                        elif isinstance(item, float):
-                            new_list.append(round(item, 2))
-                        else:
-                            new_list.append(item)
-                    result[key] = new_list
-                elif isinstance(value, enum.Enum):
-                    result[key] = value.value
-                elif isinstance(value, float):
-                    result[key] = round(value, 2)
-                else:
-                    result[key] = value
-            return result
-
-        data = {'type': self.type}
-        properties = process_data(self.properties)
-        data.update(properties)
-        data = to_ordered_dict(data)
-        return data.copy()
+        """The snippet as saved. The result is reused until the snippet changes, so callers must not mutate it."""
+        version = self.version
+        if self._built is None or self._built[0] != version:
+            data = {'type': self.type}
+            data.update(get_serializer(self.type)(self._properties))
+            # Tagged with the version it was built from: an edit made meanwhile invalidates it.
+            self._built = (version, data)
+        return self._built[1]
 
 
 class ChangeBackgroundImageSnippet(BaseSnippet):
+    __slots__ = ()
+
     def __init__(self, image_id: int):
         super().__init__('ChangeBackgroundImage', {'imageId': image_id})
 
 
 class ChangeLayoutModeSnippet(BaseSnippet):
+    __slots__ = ()
+
     def __init__(self, mode: LayoutModes):
         super().__init__('ChangeLayoutMode', {'mode': mode})
 
 
 class HideTalkSnippet(BaseSnippet):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__('HideTalk', {})
 
 
 class LayoutAppearSnippet(BaseSnippet):
+    __slots__ = ()
+
     def __init__(self, model_id: int, from_side: Sides, from_offset: float, to_side: Sides, to_offset: float,
                  motion: str, facial: str, move_speed: MoveSpeed, hologram: bool, facial_first: bool):
         super().__init__('LayoutAppear', {
@@ -179,6 +221,8 @@ class LayoutAppearSnippet(BaseSnippet):
 
 
 class LayoutClearSnippet(BaseSnippet):
+    __slots__ = ()
+
     def __init__(self, model_id: int, from_side: Sides, from_offset: float, to_side: Sides, to_offset: float,
                  move_speed: MoveSpeed):
         super().__init__('LayoutClear', {
@@ -190,12 +234,16 @@ class LayoutClearSnippet(BaseSnippet):
 
 
 class MotionSnippet(BaseSnippet):
+    __slots__ = ()
+
     def __init__(self, model_id: int, motion: str, facial: str, facial_first: bool):
         super().__init__('Motion',
                          {'modelId': model_id, 'motion': motion, 'facial': facial, 'facial_first': facial_first})
 
 
 class MoveSnippet(BaseSnippet):
+    __slots__ = ()
+
     def __init__(self, model_id: int, from_side: Sides, from_offset: float, to_side: Sides, to_offset: float,
                  move_speed: MoveSpeed):
         super().__init__('Move', {
@@ -207,26 +255,38 @@ class MoveSnippet(BaseSnippet):
 
 
 class TalkSnippet(BaseSnippet):
+    __slots__ = ()
+    text_fields = ('data.speaker', 'data.content')
+
     def __init__(self, speaker: str, content: str, model_id: int, voice: str):
         super().__init__('Talk', {'speaker': speaker, 'content': content, 'modelId': model_id, 'voice': voice})
 
 
 class TelopSnippet(BaseSnippet):
+    __slots__ = ()
+    text_fields = ('data.content',)
+
     def __init__(self, content: str):
         super().__init__('Telop', {'content': content})
 
 
 class BlackInSnippet(BaseSnippet):
+    __slots__ = ()
+
     def __init__(self, duration: int):
         super().__init__('BlackIn', {'duration': duration})
 
 
 class BlackOutSnippet(BaseSnippet):
+    __slots__ = ()
+
     def __init__(self, duration: int):
         super().__init__('BlackOut', {'duration': duration})
 
 
 class DoParamSnippet(BaseSnippet):
+    __slots__ = ()
+
     def __init__(self, model_id: int, params: list = None):
         if params is None:
             params = [{
@@ -250,22 +310,196 @@ class DoParamSnippet(BaseSnippet):
         return {}
 
 
-SNIPPETS = [
-    ChangeBackgroundImageSnippet(0),
-    ChangeLayoutModeSnippet(LayoutModes.Normal),
-    HideTalkSnippet(),
-    LayoutAppearSnippet(-1, Sides.Center, 0.0, Sides.Center, 0.0, '', '', MoveSpeed.Normal, False, True),
-    LayoutClearSnippet(-1, Sides.Center, 0.0, Sides.Center, 0.0, MoveSpeed.Normal),
-    MotionSnippet(-1, '', '', True),
-    MoveSnippet(-1, Sides.Center, 0.0, Sides.Center, 0.0, MoveSpeed.Normal),
-    TalkSnippet('', '', -1, ''),
-    TelopSnippet(''),
-    BlackInSnippet(500),
-    BlackOutSnippet(500),
-    DoParamSnippet(-1),
-]
+# Snippet type -> factory building an instance with fresh default properties, in menu order.
+SNIPPET_FACTORIES: dict[str, Callable[[], BaseSnippet]] = {
+    'ChangeBackgroundImage': lambda: ChangeBackgroundImageSnippet(0),
+    'ChangeLayoutMode': lambda: ChangeLayoutModeSnippet(LayoutModes.Normal),
+    'HideTalk': HideTalkSnippet,
+    'LayoutAppear': lambda: LayoutAppearSnippet(-1, Sides.Center, 0.0, Sides.Center, 0.0, '', '', MoveSpeed.Normal,
+                                                False, True),
+    'LayoutClear': lambda: LayoutClearSnippet(-1, Sides.Center, 0.0, Sides.Center, 0.0, MoveSpeed.Normal),
+    'Motion': lambda: MotionSnippet(-1, '', '', True),
+    'Move': lambda: MoveSnippet(-1, Sides.Center, 0.0, Sides.Center, 0.0, MoveSpeed.Normal),
+    'Talk': lambda: TalkSnippet('', '', -1, ''),
+    'Telop': lambda: TelopSnippet(''),
+    'BlackIn': lambda: BlackInSnippet(500),
+    'BlackOut': lambda: BlackOutSnippet(500),
+    'DoParam': lambda: DoParamSnippet(-1),
+}
+
+# One default instance per type, read-only: use get_snippet() for a snippet to edit.
+SNIPPETS = [factory() for factory in SNIPPET_FACTORIES.values()]
+_PROTOTYPES = {snippet.type: snippet for snippet in SNIPPETS}
 
 
 def get_snippet(snippet_type: str) -> BaseSnippet:
-    s = next((snippet for snippet in SNIPPETS if snippet.type == snippet_type), None)
-    return s.copy() if s else None
+    factory = SNIPPET_FACTORIES.get(snippet_type)
+    return factory() if factory else None
+
+
+def replace_new_lines(value: str) -> str:
+    if '<' not in value:
+        return value
+    for keyword in NEW_LINE_KEYWORDS:
+        value = keyword.sub('\n', value)
+    return value
+
+
+def _same(value):
+    return value
+
+
+def _enum_value(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+def _round_number(value):
+    return round(value, 2) if type(value) is float else value
+
+
+def _text(value):
+    return replace_new_lines(value) if isinstance(value, str) else value
+
+
+def _plain_value(value):
+    """Schema-less conversion, for properties a snippet type does not declare."""
+    if isinstance(value, dict):
+        return {key: _plain_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_plain_value(item) for item in value]
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, str):
+        return replace_new_lines(value)
+    return value
+
+
+def compile_serializer(template, text_fields: tuple[str, ...] = (), path: str = '') -> Callable:
+    """
+    Builds the function turning properties shaped like ``template`` (a snippet's default properties) into plain
+    JSON data. Conversions are picked once from the template's value types, so building only touches what needs it:
+    enums, floats and the ``text_fields`` paths. Keys or values the template does not describe fall back to a
+    generic walk.
+    """
+    if isinstance(template, dict):
+        converters = {
+            key: compile_serializer(value, text_fields, f'{path}.{key}' if path else key)
+            for key, value in template.items()
+        }
+
+        def serialize_dict(value):
+            if not isinstance(value, dict):
+                return _plain_value(value)
+            return {key: converters.get(key, _plain_value)(item) for key, item in value.items()}
+
+        return serialize_dict
+
+    if isinstance(template, list):
+        item_converter = compile_serializer(template[0], text_fields, f'{path}.0') if template else _plain_value
+
+        def serialize_list(value):
+            if not isinstance(value, list):
+                return _plain_value(value)
+            return [item_converter(item) for item in value]
+
+        return serialize_list
+
+    if isinstance(template, Enum):
+        return _enum_value
+    if isinstance(template, str):
+        return _text if path in text_fields else _same
+    if isinstance(template, bool):
+        return _same
+    if isinstance(template, (int, float)):
+        return _round_number
+    return _plain_value
+
+
+_SERIALIZERS: dict[str, Callable] = {}
+
+
+def get_serializer(snippet_type: str) -> Callable:
+    """The compiled properties serializer of a snippet type, built from its entry in ``SNIPPETS`` on first use."""
+    serializer = _SERIALIZERS.get(snippet_type)
+    if serializer is None:
+        prototype = _PROTOTYPES.get(snippet_type)
+        if prototype is None:
+            serializer = _plain_value
+        else:
+            serializer = compile_serializer(prototype.properties, prototype.text_fields)
+        _SERIALIZERS[snippet_type] = serializer
+    return serializer
+
+
+def _keep_saved(value):
+    return value
+
+
+def compile_decoder(template) -> Callable:
+    """
+    Builds the function reading saved properties shaped like ``template`` (a snippet's default properties) back:
+    saved dicts are laid over the template's defaults, and the saved strings of its enum fields become enum
+    members again. Keys the template does not describe are kept as saved.
+    """
+    if isinstance(template, dict):
+        fields = {key: compile_decoder(value) for key, value in template.items()}
+        fields = {key: decoder for key, decoder in fields.items() if decoder is not _keep_saved}
+        # Defaults that must not be shared with the template when the saved dict lacks them.
+        mutable = tuple(key for key, value in template.items() if isinstance(value, (dict, list)))
+
+        def decode_dict(value):
+            if not isinstance(value, dict):
+                return value
+            result = {**template, **value}
+            for key, decoder in fields.items():
+                if key in value:
+                    result[key] = decoder(value[key])
+            for key in mutable:
+                if key not in value:
+                    result[key] = copy.deepcopy(template[key])
+            return result
+
+        return decode_dict
+
+    if isinstance(template, list):
+        if not template:
+            return _keep_saved
+        item_decoder = compile_decoder(template[0])
+
+        def decode_list(value):
+            if not isinstance(value, list):
+                return value
+            return [item_decoder(item) for item in value]
+
+        return decode_list
+
+    if isinstance(template, Enum):
+        enum_class = type(template)
+        members = {member.value: member for member in enum_class}
+
+        def decode_enum(value):
+            member = members.get(value)
+            return member if member is not None else enum_class(value)
+
+        return decode_enum
+    return _keep_saved
+
+
+_DECODERS: dict[str, Callable] = {}
+
+
+def load_snippet(saved: dict) -> BaseSnippet:
+    """A snippet from its saved form (as built), decoded with the compiled decoder of its type."""
+    snippet_type = saved['type']
+    prototype = _PROTOTYPES.get(snippet_type)
+    if prototype is None:
+        raise ValueError(f'Unknown snippet type: {snippet_type}')
+
+    decoder = _DECODERS.get(snippet_type)
+    if decoder is None:
+        decoder = _DECODERS[snippet_type] = compile_decoder(prototype.properties)
+
+    properties = decoder({key: value for key, value in saved.items() if key != 'type'})
+    return prototype.__class__.from_properties(snippet_type, properties)
@@ -0,0 +1,130 @@
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from app.snippets import BaseSnippet, load_snippet
+from app.utils import get_motions
+
+
+def model_name_from_file(file_name_with_ext: str) -> str:
+    if '.model3.json' in file_name_with_ext:
+        return file_name_with_ext.split('.model3.json')[0]
+    elif '.model.json' in file_name_with_ext:
+        return file_name_with_ext.split('.model.json')[0]
+    elif file_name_with_ext == 'model.json':
+        return 'model'
+    raise RuntimeError(f"What is the model name: {file_name_with_ext}")
+
+
+def build_model_entry(model_name: str, path: str, downloaded: bool, id_: int,
+                      client: Optional[httpx.Client] = None) -> dict:
+    """The model dict kept in ``MetaData.models``, with the motion and expression names read from the model."""
+    motions = ["None"]
+    expressions = ["None"]
+
+    if not downloaded:
+        result = get_motions(path, client)
+
+        if result['model']:
+            if 'motions' in result['model']:
+                motions.extend(result['model']['motions'])
+            if 'expressions' in result['model']:
+                expressions.extend(result['model']['expressions'])
+        if result['special']:
+            if 'motions' in result['special']:
+                motions.extend(result['special']['motions'])
+            if 'expressions' in result['special']:
+                expressions.extend(result['special']['expressions'])
+        if result['common']:
+            if 'motions' in result['common']:
+                motions.extend(result['common']['motions'])
+            if 'expressions' in result['common']:
+                expressions.extend(result['common']['expressions'])
+        model_version = 3
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+            if 'motions' in data:
+                # Cubism2
+                motions_data: dict = data.get('motions')
+                if motions_data:
+                    local_motions = motions_data.keys()
+                    for motion in local_motions:
+                        motions.append(motion)
+                model_version = 2
+            else:
+                # Cubism4
+                motions_data: dict = data["FileReferences"].get('Motions')
+
+                if motions_data:
+                    local_motions = motions_data.keys()
+                    for motion in local_motions:
+                        if motion.startswith("face_"):
+                            expressions.append(motion)
+                        else:
+                            motions.append(motion)
+                model_version = 3
+
+    return {
+        "id": id_,
+        "model_name": model_name,
+        "path": path,
+        "downloaded": downloaded,
+        "motions": motions,
+        "expressions": expressions,
+        "version": model_version,
+        "normal_scale": 2.1,
+        "small_scale": 1.8,
+        "anchor": 0.5,
+    }
+
+
+def decode_snippet(snippet: dict, base_path: str) -> BaseSnippet:
+    snippet_instance = load_snippet(snippet)
+
+    data = snippet_instance.properties.get('data')
+    if isinstance(data, dict) and data.get('voice'):
+        data['voice'] = os.path.abspath(os.path.join(base_path, "voices", data['voice'])).replace("\\", "/")
+    return snippet_instance
+
+
+def load_story(file_path: str) -> dict:
+    """
+    Reads an exported ``.sekai-story.json`` back into ``{"models", "images", "snippets"}``: model and image dicts in
+    the ``MetaData`` layout pointing at the exported files, and snippet instances. Needs no Qt.
+    """
+    base_path = os.path.dirname(file_path)
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data_json = json.loads(f.read())
+
+    models = []
+    for model in data_json['models']:
+        model_name = model_name_from_file(model['model'].split('/')[-1])
+        entry = build_model_entry(model_name, os.path.join(base_path, "models", model['model']), True, model['id'])
+
+        for key in ('normal_scale', 'small_scale', 'anchor'):
+            if model.get(key) is not None:
+                entry[key] = model[key]
+        models.append(entry)
+
+    images = [
+        {
+            "id": image['id'],
+            "name": Path(image['image'].split('/')[-1]).stem,
+            "path": os.path.join(base_path, "images", image['image']),
+        }
+        for image in data_json['images']
+    ]
+
+    snippets = [decode_snippet(snippet, base_path) for snippet in data_json['snippets']]
+
+    return {
+        'models': models,
+        'images': images,
+        'snippets': snippets,
+    }
@@ -1,61 +1,24 @@
 import os
-from collections import OrderedDict
+from typing import Optional
 from urllib.parse import urlparse
 
 import httpx
-from PySide6.QtCore import QSortFilterProxyModel, Qt, QStringListModel
-from PySide6.QtWidgets import QCompleter
 from httpx_retries import Retry, RetryTransport
 
 
-class FuzzyFilterProxyModel(QSortFilterProxyModel):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.setDynamicSortFilter(True)
-        self.pattern = ""
-
-    def set_filter_pattern(self, pattern):
-        self.pattern = pattern
-        self.invalidateFilter()
-
-    @staticmethod
-    def fuzzy_match(pattern, text):
-        """Simple fuzzy matching: all pattern chars appear in order in text"""
-        pattern = pattern.lower()
-        text = text.lower()
-        it = iter(text)
-        return all(char in it for char in pattern)
-
-    def filterAcceptsRow(self, source_row, source_parent):
-        if not self.pattern:
-            return True
-        model = self.sourceModel()
-        index = model.index(source_row, self.filterKeyColumn(), source_parent)
-        text = model.data(index, Qt.ItemDataRole.DisplayRole)
-        return self.fuzzy_match(self.pattern, text)
-
-
-class FuzzyCompleter(QCompleter):
-    def __init__(self, model_list: list, parent=None):
-        self.proxy_model = FuzzyFilterProxyModel()
-        self.proxy_model.setSourceModel(QStringListModel(model_list))
-        super().__init__(self.proxy_model, parent)
-        self.setCompletionMode(QCompleter.CompletionMode.PopupCompletion)
-        self.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.setFilterMode(Qt.MatchFlag.MatchContains)
-
-    def update(self, pattern):
-        self.proxy_model.set_filter_pattern(pattern)
-        self.complete()
-
-
 def build_model_base_json(server_host: str, model_list: list, model_name: str):
     model_info: dict = [model for model in model_list if model['modelName'] == model_name][0]
     model_url = f"https://storage.sekai.best/sekai-live2d-assets/live2d/model/{model_info['modelPath']}"
     return f"{server_host}/get/{model_url}/{model_info['modelFile']}"
 
 
+def unwrap_proxy_url(url: str) -> str:
+    """Strips the local caching server prefix (its port changes every run) from a URL built by the app."""
+    if url.startswith('http://127.0.0.1:') and '/get/' in url:
+        return url.split('/get/', 1)[1]
+    return url
+
+
 def extract_url_path(url):
     parsed = urlparse(url)
 
@@ -83,7 +46,12 @@ def extract_url_path(url):
     return new_url
 
 
-def get_motions(main_path) -> dict:
+def get_motions(main_path, client: Optional[httpx.Client] = None) -> dict:
+    if client is None:
+        retry = Retry(total=10, backoff_factor=0.5)
+        with httpx.Client(transport=RetryTransport(retry=retry)) as client:
+            return get_motions(main_path, client)
+
     result = {
         "model": {},
         "special": {},
@@ -104,11 +72,9 @@ def get_motions(main_path) -> dict:
     result['special_url'] = special_motions_url
     result['common_url'] = common_motions_url
 
-    retry = Retry(total=10, backoff_factor=0.5)
-    with httpx.Client(transport=RetryTransport(retry=retry)) as client:
-        model_motion_result = client.get(model_motion_url)
-        special_motions_result = client.get(special_motions_url)
-        common_motions_result = client.get(common_motions_url)
+    model_motion_result = client.get(model_motion_url)
+    special_motions_result = client.get(special_motions_url)
+    common_motions_result = client.get(common_motions_url)
 
     if model_motion_result.status_code == 200:
         model_motion_data = model_motion_result.json()
@@ -123,10 +89,3 @@ def get_motions(main_path) -> dict:
         result['common'] = common_motions_data
 
     return result
-
-def to_ordered_dict(obj):
-    if isinstance(obj, dict):
-        return OrderedDict((k, to_ordered_dict(v)) for k, v in obj.items())
-    elif isinstance(obj, list):
-        return [to_ordered_dict(item) for item in obj]
-    return obj
@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 
-from PySide6.QtCore import Signal, QThread
+from PySide6.QtGui import QUndoStack
 from PySide6.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout, QSizePolicy, QStackedWidget, QFileDialog, \
     QListWidgetItem, QGridLayout
 from qfluentwidgets import Pivot, \
@@ -9,33 +9,24 @@ from qfluentwidgets import Pivot, \
     Flyout, InfoBarIcon, FlyoutAnimationType, ComboBox, FluentIcon, TeachingTip, \
     TeachingTipTailPosition, ListWidget, CaptionLabel, LineEdit, SpinBox, DoubleSpinBox
 
-from app.components import Live2DWidget, DownloadingFlyout, ImageDisplayWidget
+from app.components import Live2DWidget, DownloadingFlyout, ImageDisplayWidget, FuzzyCompleter, CallbackCommand, \
+    SetModelPropertyCommand
 from app.data_model import MetaData
-from app.utils import FuzzyCompleter, build_model_base_json
-
-
-class AddModelThread(QThread):
-    model_added = Signal(str)
-
-    def __init__(self, meta_data, model_, model_list, server_host: str, parent=None):
-        super().__init__(parent)
-        self.server_host = server_host
-        self.meta_data = meta_data
-        self.model = model_
-        self.model_list = model_list
-
-    def run(self):
-        data = self.meta_data.add_model(self.model,
-                                        build_model_base_json(self.server_host, self.model_list, self.model), False)
-        self.model_added.emit(f'{self.model} #{data["id"]}')
+from app.export import ExportService, PRIORITY_INTERACTIVE
+from app.jobs import JobSignals
+from app.story_io import build_model_entry
+from app.utils import build_model_base_json
 
 
 class ModelManageFrame(QFrame):
-    def __init__(self, metadata: MetaData, server_host: str, parent=None):
+    def __init__(self, metadata: MetaData, server_host: str, export_service: ExportService, undo_stack: QUndoStack,
+                 parent=None):
         super().__init__(parent)
         self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
 
         self.server_host = server_host
+        self.export_service = export_service
+        self.undo_stack = undo_stack
         self.meta_data = metadata
         self.meta_data.model_updated.connect(self.on_model_updated)
 
@@ -160,8 +151,27 @@ class ModelManageFrame(QFrame):
     def showEvent(self, event, /):
         super().showEvent(event)
         if self.need_update:
-            self.model_list_widget.clear()
-            self.model_list_widget.addItems([f'{data["model_name"]} #{data["id"]}' for data in self.meta_data.models])
+            self.refresh_models()
+
+    def refresh_models(self):
+        index = self.model_list_widget.currentIndex()
+        self.model_list_widget.clear()
+        self.model_list_widget.addItems([f'{data["model_name"]} #{data["id"]}' for data in self.meta_data.models])
+
+        index = min(index, len(self.meta_data.models) - 1)
+        if index >= 0:
+            self.model_list_widget.setCurrentIndex(index)
+        self.on_model_selection_changed(index)
+        self.need_update = False
+
+    def _record_model_added(self, data: dict):
+        position = data['id']
+        self.undo_stack.push(CallbackCommand(
+            f'Add model {data["model_name"]}',
+            lambda: self.meta_data.insert_model_entry(position, data),
+            lambda: self.meta_data.remove_model(position),
+            self.refresh_models
+        ))
 
     def add_model_from_local(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -198,6 +208,7 @@ class ModelManageFrame(QFrame):
         data = self.meta_data.add_model(model_name, file_path, True)
         self.model_list_widget.addItem(f'{model_name} #{data["id"]}')
         self.model_list_widget.setCurrentIndex(len(self.meta_data.models) - 1)
+        self._record_model_added(data)
 
     def renumber_models(self):
         for i in range(self.model_list_widget.count()):
@@ -210,10 +221,17 @@ class ModelManageFrame(QFrame):
     def delete_model(self):
         if len(self.meta_data.models) > 0 and len(self.model_list_widget.items) > 0:
             index = self.model_list_widget.currentIndex()
+            removed = self.meta_data.models[index]
 
             self.model_list_widget.removeItem(index)
             self.meta_data.remove_model(index)
             self.renumber_models()
+            self.undo_stack.push(CallbackCommand(
+                f'Delete model {removed["model_name"]}',
+                lambda: self.meta_data.remove_model(index),
+                lambda: self.meta_data.insert_model_entry(index, removed),
+                self.refresh_models
+            ))
 
             if index > 0:
                 new_index = index - 1
@@ -262,21 +280,47 @@ class ModelManageFrame(QFrame):
             parent=self,
         )
 
-        add_model_thread = AddModelThread(
-            meta_data=self.meta_data,
-            model_=model,
-            model_list=self.model_list,
-            server_host=self.server_host,
-            parent=self
+        model_url = build_model_base_json(self.server_host, self.model_list, model)
+        signals = JobSignals(self)
+        signals.finished.connect(self.on_model_added)
+        signals.failed.connect(self.on_model_add_failed)
+        self.export_service.submit(
+            ('add_model', model),
+            lambda job: self._add_online_model(model, model_url),
+            PRIORITY_INTERACTIVE,
+            **signals.listen()
         )
-        add_model_thread.model_added.connect(self.on_model_added)
-        add_model_thread.start()
 
-    def on_model_added(self, result):
-        self.model_list_widget.addItem(result)
+    def _add_online_model(self, model: str, model_url: str) -> dict:
+        # Runs on an ExportService worker, the motion lists are fetched through its pooled client. The entry is
+        # added to the library by on_model_added, on the UI thread.
+        return build_model_entry(model, model_url, False, -1, self.export_service.client)
+
+    def on_model_added(self, entry: dict):
+        self.teaching_tip.hide()
+        self.add_button.setDisabled(False)
+        # The same model may have been added, or another story loaded, while this one downloaded.
+        if entry['model_name'] in [model['model_name'] for model in self.meta_data.models]:
+            return
+
+        self.meta_data.insert_model_entry(len(self.meta_data.models), entry)
+        data = self.meta_data.models[-1]
+        self.model_list_widget.addItem(f'{data["model_name"]} #{data["id"]}')
         self.model_list_widget.setCurrentIndex(len(self.meta_data.models) - 1)
+        self._record_model_added(data)
+
+    def on_model_add_failed(self, message: str):
         self.teaching_tip.hide()
         self.add_button.setDisabled(False)
+        Flyout.create(
+            icon=InfoBarIcon.ERROR,
+            title='Error',
+            content=message,
+            target=self.add_button,
+            parent=self,
+            isClosable=True,
+            aniType=FlyoutAnimationType.PULL_UP
+        )
 
     def update_data(self, model_list: list):
         self.model_list = model_list
@@ -317,8 +361,10 @@ class ModelManageFrame(QFrame):
 
     def on_model_property_changed(self, key: str, val: float):
         if self.current_model_index >= 0:
-            self.meta_data.models[self.current_model_index][key] = val
-            self.meta_data.model_updated.emit(self.meta_data.models[self.current_model_index])
+            index = self.current_model_index
+            old = self.meta_data.models[index].get(key)
+            self.meta_data.set_model_property(index, key, val)
+            self.undo_stack.push(SetModelPropertyCommand(self.meta_data, index, key, old, val, self.refresh_models))
 
     def preview_model(self):
         model = self.online_model_combo_box.currentText()
@@ -340,9 +386,10 @@ class ModelManageFrame(QFrame):
 
 
 class ImageManageFrame(QFrame):
-    def __init__(self, meta_data: MetaData, parent=None):
+    def __init__(self, meta_data: MetaData, undo_stack: QUndoStack, parent=None):
         super().__init__(parent)
         self.meta_data = meta_data
+        self.undo_stack = undo_stack
         self.meta_data.image_updated.connect(self.on_image_updated)
         self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
 
@@ -396,26 +443,32 @@ class ImageManageFrame(QFrame):
     def showEvent(self, event):
         super().showEvent(event)
         if self.need_update:
-            self.images = []
-            for image in self.meta_data.images:
-                filename = os.path.basename(image['path'])
-                self.images.append({
-                    'name': f'{filename} {image["id"]}',
-                    'path': image['path'],
-                    'index': image["id"]
-                })
-
-            current_row = self.image_list_widget.currentRow()
-            self.image_list_widget.clear()
-            self.image_list_widget.addItems([f'{data["name"]} #{data["id"]}' for data in self.meta_data.images])
-            if current_row == -1 and self.image_list_widget.count() > 0:
-                i = [data['path'] for data in self.images if data['index'] == 0][0]
-                self.image_list_widget.setCurrentRow(0)
-                self.image_widget.display_image(i)
-            elif current_row <= self.image_list_widget.count() - 1:
-                i = [data['path'] for data in self.images if data['index'] == current_row][0]
-                self.image_list_widget.setCurrentRow(current_row)
-                self.image_widget.display_image(i)
+            self.refresh_images()
+
+    def refresh_images(self):
+        self.images = []
+        for image in self.meta_data.images:
+            filename = os.path.basename(image['path'])
+            self.images.append({
+                'name': f'{filename} {image["id"]}',
+                'path': image['path'],
+                'index': image["id"]
+            })
+
+        current_row = self.image_list_widget.currentRow()
+        self.image_list_widget.clear()
+        self.image_list_widget.addItems([f'{data["name"]} #{data["id"]}' for data in self.meta_data.images])
+        if current_row == -1 and self.image_list_widget.count() > 0:
+            i = [data['path'] for data in self.images if data['index'] == 0][0]
+            self.image_list_widget.setCurrentRow(0)
+            self.image_widget.display_image(i)
+        elif 0 <= current_row <= self.image_list_widget.count() - 1:
+            i = [data['path'] for data in self.images if data['index'] == current_row][0]
+            self.image_list_widget.setCurrentRow(current_row)
+            self.image_widget.display_image(i)
+        else:
+            self.image_widget.clear()
+        self.need_update = False
 
     def renumber_images(self):
         images_new = []
@@ -441,6 +494,7 @@ class ImageManageFrame(QFrame):
             index = self.image_list_widget.currentRow()
 
             i = [image for image in self.images if image['index'] == index][0]
+            removed = [image for image in self.meta_data.images if image['id'] == i['index']][0]
 
             self.image_list_widget.takeItem(index)
 
@@ -449,6 +503,12 @@ class ImageManageFrame(QFrame):
             self.renumber_images()
             self.meta_data.remove_image(i['index'])
             self.image_widget.clear()
+            self.undo_stack.push(CallbackCommand(
+                f'Delete image {removed["name"]}',
+                lambda: self.meta_data.remove_image(removed['id']),
+                lambda: self.meta_data.insert_image(removed['id'], removed),
+                self.refresh_images
+            ))
 
     def on_image_clicked(self, item: QListWidgetItem):
         index = self.image_list_widget.row(item)
@@ -471,6 +531,12 @@ class ImageManageFrame(QFrame):
         })
 
         self.image_list_widget.setCurrentRow(insert_pos)
+        self.undo_stack.push(CallbackCommand(
+            f'Add image {filename}',
+            lambda: self.meta_data.insert_image(insert_pos, data),
+            lambda: self.meta_data.remove_image(insert_pos),
+            self.refresh_images
+        ))
 
     def add_image(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -487,7 +553,8 @@ class ImageManageFrame(QFrame):
 
 
 class DataView(QFrame):
-    def __init__(self, metadata: MetaData, server_host: str, parent=None):
+    def __init__(self, metadata: MetaData, server_host: str, export_service: ExportService, undo_stack: QUndoStack,
+                 parent=None):
         super().__init__(parent)
         self.setObjectName('DataView')
         self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
@@ -503,8 +570,8 @@ class DataView(QFrame):
         self.stacked_widget = QStackedWidget(self)
         self.stacked_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
 
-        self.model_manage_frame = ModelManageFrame(self.meta_data, self.server_host, self)
-        self.image_manage_frame = ImageManageFrame(self.meta_data, self)
+        self.model_manage_frame = ModelManageFrame(self.meta_data, self.server_host, export_service, undo_stack, self)
+        self.image_manage_frame = ImageManageFrame(self.meta_data, undo_stack, self)
 
         self.add_sub_interface(self.model_manage_frame, 'modelInterface', 'Models')
         self.add_sub_interface(self.image_manage_frame, 'imageInterface', 'Images')
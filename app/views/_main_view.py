@@ -1,252 +1,36 @@
-import asyncio
-import json
 import os
-import shutil
-import uuid
-from collections import OrderedDict
-from pathlib import Path
-
-import httpx
-from PySide6.QtCore import Qt, QThread, Signal
-from PySide6.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout, QSplitter, QSizePolicy, QListWidgetItem, QFileDialog
-from httpx_retries import RetryTransport, Retry
+from dataclasses import replace
+from typing import Callable
+
+from PySide6.QtCore import Qt, QTimer, QItemSelection, QItemSelectionModel
+from PySide6.QtGui import QKeySequence, QShortcut, QUndoStack
+from PySide6.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout, QSplitter, QSizePolicy, QFileDialog, \
+    QAbstractItemView
 from qfluentwidgets import CommandBar, setFont, Action, TransparentToolButton, FluentIcon, HorizontalSeparator, \
-    ListWidget
+    ListView, InfoBar, InfoBarPosition, MessageBox
 
-from app.components import SnippetPropertiesWidget, SaveFileMessageBox
+from app.components import SnippetPropertiesWidget, SaveFileMessageBox, ExportOptionsMessageBox, SnippetListModel, \
+    SnippetSearchPanel, FindReplaceMessageBox, InsertSnippetsCommand, RemoveSnippetsCommand, MoveSnippetsCommand, \
+    SetPropertiesCommand
 from app.data_model import MetaData
-from app.snippets import SNIPPETS, BaseSnippet, get_snippet, LayoutModes, Sides, MoveSpeed
-from app.utils import extract_url_path, get_motions, to_ordered_dict
-
-
-class BuildStoryThread(QThread):
-    built = Signal(OrderedDict, str)
-
-    def __init__(self, file_path: str, metadata: MetaData, snippets: list[BaseSnippet], parent):
-        super().__init__(parent)
-        self.snippets = snippets
-        self.file_path = file_path
-        self.metadata = metadata
-        self.models = metadata.models
-        self.base_path = os.path.dirname(self.file_path)
-        self.retry = Retry(total=10, backoff_factor=0.5)
-        self.client = httpx.Client(transport=RetryTransport(retry=self.retry))
-
-    def cancel(self):
-        self.terminate()
-        print('Canceled')
-        for model in [model for model in self.models if model['downloaded'] == False]:
-            model_path = os.path.join(
-                self.base_path,
-                'models',
-                model['model_name'],
-            )
-
-            if not os.path.exists(model_path):
-                continue
-
-            print(f'Remove downloaded: {model_path}')
-            shutil.rmtree(model_path)
-
-    def download(self, path: str, filename: str, url: str) -> bytes:
-        full_path = os.path.join(path, filename)
-        with open(full_path, "wb+") as file:
-            resp = self.client.get(url)
-            file.write(resp.content)
-            return resp.content
-
-    @staticmethod
-    def gen_motion_urls(info_url: str, motions_result: dict, type_: str) -> list:
-        result = []
-        base = extract_url_path(info_url)
-
-        if type_ == 'model':
-            base_motion = '/'.join(base.split('/')[:-2]) + "/motions"
-            base_facial = base_motion
-        else:
-            base_motion = base + "motion"
-            base_facial = base + "facial"
-
-        if 'motions' in motions_result[type_]:
-            for motion in motions_result[type_]['motions']:
-                result.append(f"{base_motion}/{motion}.motion3.json")
-        if 'expressions' in motions_result[type_]:
-            for expression in motions_result[type_]['expressions']:
-                result.append(f"{base_facial}/{expression}.motion3.json")
-        return result
-
-    @staticmethod
-    async def download_motion_and_save(client: httpx.AsyncClient, url: str, motion_path: str, main_data: dict):
-        r = await client.get(url)
-        m_file_name_ext = os.path.basename(r.url.path)
-        m_file_name = m_file_name_ext.split('.motion3.json')[0]
-        file_path = os.path.join(motion_path, m_file_name_ext)
-        main_data["FileReferences"]["Motions"][m_file_name] = [{
-            "FadeInTime": 0.5,
-            "FadeOutTime": 0.5,
-            "File": f"motions/{m_file_name_ext}"
-        }]
-        with open(file_path, "wb") as file:
-            file.write(r.content)
-
-    async def download_motions(self, urls: list, motion_path: str, main_data: dict):
-        async with httpx.AsyncClient(transport=RetryTransport(retry=self.retry)) as client:
-            tasks = [self.download_motion_and_save(client, url, motion_path, main_data) for url in urls]
-            await asyncio.gather(*tasks)
-
-    def run(self):
-        models_data = []
-        for model in self.models:
-            print(f"Saving: {model}")
-            suffix = '.model3.json' if model['version'] == 3 else '.model.json'
-
-            rel_model_path = str(os.path.join(
-                model['model_name'],
-                model['model_name'] + suffix
-            )).replace("\\", "/")
-
-            model_path = os.path.join(
-                self.base_path,
-                'models',
-                rel_model_path
-            )
-
-            model_dir = os.path.dirname(model_path)
-            file_name = os.path.basename(model_path)
-
-            models_data.append({
-                "id": model['id'],
-                "model": rel_model_path,
-                "normal_scale": round(model['normal_scale'], 2),
-                "small_scale": round(model['small_scale'], 2),
-                "anchor": round(model['anchor'], 2),
-            })
-
-            if not model['downloaded']:
-                if os.path.exists(model_path):
-                    print(f"{model_path} already exists, skipping.")
-                    model['downloaded'] = True
-                    continue
-
-                os.makedirs(model_dir, exist_ok=True)
-                base_url = extract_url_path(model['path'])
-
-                main = self.download(
-                    model_dir,
-                    file_name,
-                    model['path']
-                ).decode('utf-8')
-
-                main_data = json.loads(main)
-                for file_type in main_data['FileReferences'].keys():
-                    if file_type == 'Moc' or file_type == 'Physics':
-                        path = os.path.join(model_dir, main_data['FileReferences'][file_type])
-                        os.makedirs(os.path.dirname(path), exist_ok=True)
-                        self.download(
-                            os.path.dirname(path),
-                            main_data['FileReferences'][file_type],
-                            base_url + main_data['FileReferences'][file_type]
-                        )
-                    elif file_type == 'Textures':
-                        for texture in main_data['FileReferences'][file_type]:
-                            path = os.path.join(model_dir, texture)
-                            os.makedirs(os.path.dirname(path), exist_ok=True)
-                            self.download(
-                                os.path.dirname(path),
-                                os.path.basename(texture),
-                                base_url + texture
-                            )
-
-                urls = []
-
-                motions_result = get_motions(model['path'])
-
-                if motions_result['model']:
-                    url = motions_result['model_url']
-                    urls.extend(self.gen_motion_urls(url, motions_result, 'model'))
-
-                if motions_result['special']:
-                    url = motions_result['special_url']
-                    urls.extend(self.gen_motion_urls(url, motions_result, 'special'))
-
-                if motions_result['common_url']:
-                    url = motions_result['common_url']
-                    urls.extend(self.gen_motion_urls(url, motions_result, 'common'))
-
-                motion_path = os.path.join(model_dir, 'motions')
-                os.makedirs(motion_path, exist_ok=True)
-
-                main_data["FileReferences"]["Motions"] = {}
-                for i in range(0, len(urls), 50):
-                    chunk = urls[i:i + 50]
-                    asyncio.run(
-                        self.download_motions(chunk, motion_path, main_data)
-                    )
-
-                with open(model_path, "w+") as file:
-                    file.write(json.dumps(main_data, indent=2, ensure_ascii=False))
-
-                model['downloaded'] = True
-            else:
-                if os.path.exists(model_path):
-                    print(f"{model_path} already exists, skipping.")
-                    continue
-
-                shutil.copytree(os.path.dirname(model['path']), model_dir, dirs_exist_ok=True)
-
-        images_data = []
-        image_dir = os.path.join(self.base_path, 'images')
-        os.makedirs(image_dir, exist_ok=True)
-        for image in self.metadata.images:
-            file_name_ext = os.path.basename(image['path'])
-            img_path = os.path.join(image_dir, file_name_ext)
-            if os.path.exists(img_path):
-                print(f"{img_path} already exists, skipping.")
-            else:
-                shutil.copy(image['path'], img_path)
-            images_data.append({
-                "id": image['id'],
-                "image": f'{file_name_ext}'
-            })
-
-        os.makedirs(os.path.join(self.base_path, 'voices'), exist_ok=True)
-
-        snippets_data = []
-        for snippet in self.snippets:
-            data = snippet.build()
-            if 'data' in data:
-                if 'voice' in data['data'] and data['data']['voice']:
-                    voice_path = Path(data['data']['voice'])
-
-                    if voice_path.parent == Path(os.path.abspath(os.path.join(self.base_path, 'voices/'))):
-                        print(f'{voice_path} already exists, skipping.')
-                        data['data']['voice'] = voice_path.name
-                    else:
-                        new_voice_name = f'{str(uuid.uuid4().hex)}{voice_path.suffix}'
-                        new_voice_path = os.path.abspath(
-                            os.path.join(self.base_path, 'voices', new_voice_name)
-                        )
-                        shutil.copy(voice_path, new_voice_path)
-                        data['data']['voice'] = new_voice_name
-                        snippet.set_property('data.voice', new_voice_path)
-
-            snippets_data.append(data)
-
-        self.built.emit(to_ordered_dict({
-            '$schema': 'https://raw.githubusercontent.com/Untitled-Story/MySekaiStoryteller/refs/heads/master/sekai-story.schema.json',
-            'models': models_data,
-            'images': images_data,
-            'snippets': snippets_data,
-        }), self.file_path)
+from app.export import StoryExporter, ExportOptions, ExportService, ExportJob, PRIORITY_INTERACTIVE, PRIORITY_EXPORT, \
+    PRIORITY_PLAN, format_plan
+from app.jobs import JobSignals
+from app.snippet_index import SnippetIndex, apply_replacements
+from app.snippets import SNIPPETS, BaseSnippet, get_snippet
+from app.story_io import load_story
 
 
 class MainView(QFrame):
-    def __init__(self, metadata: MetaData, server_host: str, parent=None) -> None:
+    def __init__(self, metadata: MetaData, server_host: str, export_service: ExportService, undo_stack: QUndoStack,
+                 parent=None) -> None:
         super().__init__(parent)
         self.setObjectName('MainView')
 
         self.server_host = server_host
         self.meta_data = metadata
+        self.export_service = export_service
+        self.undo_stack = undo_stack
         self.meta_data.model_updated.connect(self._on_model_update)
 
         self._main_layout = QVBoxLayout(self)
@@ -269,6 +53,19 @@ class MainView(QFrame):
 
         command_bar.addSeparator()
 
+        undo_button = TransparentToolButton(FluentIcon.LEFT_ARROW, parent=self)
+        undo_button.setToolTip('Undo')
+        undo_button.clicked.connect(self.undo_stack.undo)
+        undo_button.setEnabled(False)
+        self.undo_stack.canUndoChanged.connect(undo_button.setEnabled)
+        redo_button = TransparentToolButton(FluentIcon.RIGHT_ARROW, parent=self)
+        redo_button.setToolTip('Redo')
+        redo_button.clicked.connect(self.undo_stack.redo)
+        redo_button.setEnabled(False)
+        self.undo_stack.canRedoChanged.connect(redo_button.setEnabled)
+        command_bar.addWidget(undo_button)
+        command_bar.addWidget(redo_button)
+
         up_button = TransparentToolButton(FluentIcon.UP, parent=self)
         up_button.clicked.connect(self._on_up_clicked)
         down_button = TransparentToolButton(FluentIcon.DOWN, parent=self)
@@ -283,6 +80,11 @@ class MainView(QFrame):
         command_bar.addWidget(delete_button)
         command_bar.addWidget(copy_button)
 
+        replace_button = TransparentToolButton(FluentIcon.EDIT, parent=self)
+        replace_button.setToolTip('Find and replace')
+        replace_button.clicked.connect(self._on_replace_clicked)
+        command_bar.addWidget(replace_button)
+
         command_bar.addSeparator()
 
         load_button = TransparentToolButton(FluentIcon.FOLDER, parent=self)
@@ -293,6 +95,15 @@ class MainView(QFrame):
         save_button.clicked.connect(self._on_save_clicked)
         command_bar.addWidget(save_button)
 
+        plan_button = TransparentToolButton(FluentIcon.INFO, parent=self)
+        plan_button.setToolTip('Estimate export')
+        plan_button.clicked.connect(self._on_plan_clicked)
+        command_bar.addWidget(plan_button)
+
+        export_options_button = TransparentToolButton(FluentIcon.SETTING, parent=self)
+        export_options_button.clicked.connect(self._on_export_options_clicked)
+        command_bar.addWidget(export_options_button)
+
         snippets_layout.addWidget(command_bar, 1)
 
         # Top Separator
@@ -308,31 +119,66 @@ class MainView(QFrame):
         center_layout.addWidget(central_splitter)
 
         # Left list
-        self._list_widget = ListWidget()
-        self._list_widget.itemClicked.connect(self._on_snippet_selected)
-        central_splitter.addWidget(self._list_widget)
+        self._snippet_model = SnippetListModel(self)
+        self._list_view = ListView()
+        self._list_view.setUniformItemSizes(True)
+        self._list_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self._list_view.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
+        self._list_view.setDefaultDropAction(Qt.DropAction.MoveAction)
+        self._list_view.setModel(self._snippet_model)
+        self._snippet_model.rows_dropped.connect(self._on_rows_dropped)
+        self._list_view.selectionModel().currentChanged.connect(self._on_selection_changed)
+        self._list_view.selectionModel().selectionChanged.connect(self._on_selection_changed)
+        self._selection_pending = False
+
+        self._snippet_index = SnippetIndex()
+        self._search_panel = SnippetSearchPanel(self._snippet_model, self._snippet_index)
+        self._search_panel.result_activated.connect(lambda row: self._select_block(row, 1))
+        QShortcut(QKeySequence.StandardKey.Find, self, self._search_panel.focus_search)
+        QShortcut(QKeySequence.StandardKey.Replace, self, self._on_replace_clicked)
+
+        left_splitter = QSplitter(Qt.Orientation.Vertical)
+        left_splitter.addWidget(self._list_view)
+        left_splitter.addWidget(self._search_panel)
+        left_splitter.setSizes([500, 200])
+        central_splitter.addWidget(left_splitter)
 
         # Center
         # live2d_widget = Live2DWidget()
         # central_splitter.addWidget(live2d_widget)
 
         # Right
-        self._property_widget = SnippetPropertiesWidget(self)
+        self._property_widget = SnippetPropertiesWidget(self.undo_stack, self)
         central_splitter.addWidget(self._property_widget)
 
         # Final
         central_splitter.setSizes([150, 500, 250])
 
-        self.current_snippets: list[BaseSnippet] = []
-
         self.need_update = False
         self.save_message_box = None
-
-    def _renumber_snippets(self) -> None:
-        for i in range(self._list_widget.count()):
-            item = self._list_widget.item(i)
-            snippet = self.current_snippets[i]
-            item.setText(f"{snippet.type} #{i + 1}")
+        self.export_options = ExportOptions.load()
+
+    @property
+    def current_snippets(self) -> list[BaseSnippet]:
+        return self._snippet_model.snippets
+
+    def _current_row(self) -> int:
+        return self._list_view.currentIndex().row()
+
+    def _selected_rows(self) -> list[int]:
+        rows = sorted(index.row() for index in self._list_view.selectionModel().selectedRows())
+        if not rows and self._current_row() >= 0:
+            rows = [self._current_row()]
+        return rows
+
+    def _select_block(self, first: int, count: int) -> None:
+        """Selects ``count`` rows from ``first`` and makes ``first`` the current row."""
+        model = self._snippet_model
+        selection_model = self._list_view.selectionModel()
+        selection_model.setCurrentIndex(model.index(first), QItemSelectionModel.SelectionFlag.NoUpdate)
+        selection_model.select(QItemSelection(model.index(first), model.index(first + count - 1)),
+                               QItemSelectionModel.SelectionFlag.ClearAndSelect)
+        self._list_view.scrollTo(model.index(first))
 
     def _on_model_update(self):
         self.need_update = True
@@ -340,132 +186,232 @@ class MainView(QFrame):
     def showEvent(self, event, /):
         super().showEvent(event)
         if self.need_update:
-            index = self._list_widget.currentRow()
-            if 0 <= index < len(self.current_snippets):
-                self._property_widget.set_snippet(self.current_snippets[index], self.meta_data)
+            self._show_selection()
             self.need_update = False
 
-    def _add_snippet_instance(self, snippet: BaseSnippet) -> None:
-        current_row = self._list_widget.currentRow()
-
-        if current_row >= 0:
-            insert_position = current_row + 1
-            snippet_show_name = f'{snippet.type} #{insert_position + 1}'
-            self.current_snippets.insert(insert_position, snippet)
-            self._list_widget.insertItem(insert_position, snippet_show_name)
-            self._list_widget.setCurrentRow(insert_position)
-
-            self._renumber_snippets()
-        else:
-            snippet_show_name = f'{snippet.type} #1'
-            self.current_snippets.append(snippet)
-            self._list_widget.addItem(snippet_show_name)
-            self._list_widget.setCurrentRow(len(self.current_snippets) - 1)
+    def _on_selection_changed(self, *_) -> None:
+        # Current and selection change together on a click; the properties panel is rebuilt once for both.
+        if not self._selection_pending:
+            self._selection_pending = True
+            QTimer.singleShot(0, self._show_selection)
+
+    def _show_selection(self) -> None:
+        self._selection_pending = False
+        snippet = self._snippet_model.snippet(self._current_row())
+        if snippet is None:
+            self._property_widget.clear_properties()
+            return
+        rows = self._list_view.selectionModel().selectedRows()
+        self._property_widget.set_snippet(snippet, self.meta_data,
+                                          [self._snippet_model.snippet(index.row()) for index in rows])
 
-        self._property_widget.set_snippet(snippet, self.meta_data)
+    def _add_snippet_instance(self, snippet: BaseSnippet) -> None:
+        current_row = self._current_row()
+        insert_position = current_row + 1 if current_row >= 0 else len(self.current_snippets)
+        self._snippet_model.insert_snippets(insert_position, [snippet])
+        self._select_block(insert_position, 1)
+        self.undo_stack.push(InsertSnippetsCommand(f'Add {snippet.type}', self._snippet_model, insert_position,
+                                                   [snippet], self._select_block))
 
     def _add_snippet(self, snippet: str) -> None:
-        new_snippet = get_snippet(snippet).copy()
+        new_snippet = get_snippet(snippet)
         self._add_snippet_instance(new_snippet)
 
-    def _on_snippet_selected(self, item: QListWidgetItem) -> None:
-        index = self._list_widget.row(item)
-        if 0 <= index < len(self.current_snippets):
-            self._property_widget.set_snippet(self.current_snippets[index], self.meta_data)
+    def _move_selection(self, destination: int) -> None:
+        rows = self._selected_rows()
+        if rows:
+            first = self._snippet_model.move_rows(rows, destination)
+            self._select_block(first, len(rows))
+            self._record_move(rows, destination, first)
 
-    def swap_items(self, index1: int, index2: int) -> None:
-        count = self._list_widget.count()
-        if not (0 <= index1 < count and 0 <= index2 < count) or index1 == index2:
+    def _record_move(self, rows: list[int], destination: int, first: int) -> None:
+        # A contiguous block that lands where it was has not moved.
+        if first == rows[0] and rows[-1] - rows[0] + 1 == len(rows):
             return
+        self.undo_stack.push(MoveSnippetsCommand(self._snippet_model, rows, destination, first, self._select_block))
 
-        min_index = min(index1, index2)
-        max_index = max(index1, index2)
-
-        item_max = self._list_widget.takeItem(max_index)
-        item_min = self._list_widget.takeItem(min_index)
-
-        self._list_widget.insertItem(min_index, item_max)
-        self._list_widget.insertItem(max_index, item_min)
-
-        self.current_snippets[min_index], self.current_snippets[max_index] = \
-            self.current_snippets[max_index], self.current_snippets[min_index]
-
-        self._renumber_snippets()
+    def _on_rows_dropped(self, rows: list[int], destination: int, first: int) -> None:
+        self._record_move(rows, destination, first)
 
     def _on_up_clicked(self) -> None:
-        current_row = self._list_widget.currentRow()
-        if current_row > 0:
-            self.swap_items(current_row, current_row - 1)
-            self._list_widget.setCurrentRow(current_row - 1)
+        rows = self._selected_rows()
+        if rows and rows[-1] - rows[0] + 1 == len(rows) and rows[0] == 0:
+            return
+        self._move_selection(rows[0] - 1 if rows else 0)
 
     def _on_down_clicked(self) -> None:
-        current_row = self._list_widget.currentRow()
-        if current_row < self._list_widget.count() - 1:
-            self.swap_items(current_row, current_row + 1)
-            self._list_widget.setCurrentRow(current_row + 1)
+        rows = self._selected_rows()
+        if rows and rows[-1] - rows[0] + 1 == len(rows) and rows[-1] == len(self.current_snippets) - 1:
+            return
+        self._move_selection(rows[-1] + 2 if rows else 0)
 
     def _on_delete_clicked(self) -> None:
-        current_row = self._list_widget.currentRow()
-        if current_row >= 0:
-            self._list_widget.takeItem(current_row)
+        rows = self._selected_rows()
+        if not rows:
+            return
 
-            if 0 <= current_row < len(self.current_snippets):
-                del self.current_snippets[current_row]
+        runs = self._snippet_model.remove_rows(rows)
+        self.undo_stack.push(RemoveSnippetsCommand(self._snippet_model, runs, self._select_block))
+        if self.current_snippets:
+            self._select_block(min(rows[0], len(self.current_snippets) - 1), 1)
+        else:
+            self._property_widget.clear_properties()
 
-            self._renumber_snippets()
+    def _on_copy_clicked(self) -> None:
+        rows = self._selected_rows()
+        if not rows:
+            return
 
-            if self._list_widget.count() > 0 and len(self.current_snippets) > 0:
-                next_row = min(current_row, self._list_widget.count() - 1)
-                self._list_widget.setCurrentRow(next_row)
-                self._property_widget.set_snippet(self.current_snippets[next_row], self.meta_data)
-            else:
-                self._property_widget.clear_properties()
+        # The copies go in one block after the last selected row, in the order of the originals.
+        copies = [self._snippet_model.snippet(row).copy() for row in rows]
+        self._snippet_model.insert_snippets(rows[-1] + 1, copies)
+        self._select_block(rows[-1] + 1, len(copies))
+        self.undo_stack.push(InsertSnippetsCommand(f'Duplicate {len(copies)} snippets', self._snippet_model,
+                                                   rows[-1] + 1, copies, self._select_block))
 
-    def _on_copy_clicked(self) -> None:
-        current_row = self._list_widget.currentRow()
-        if current_row < 0:
+    def _on_replace_clicked(self) -> None:
+        message_box = FindReplaceMessageBox(self._snippet_index, self.current_snippets, self)
+        if not message_box.exec():
             return
 
-        snippet_to_copy = self.current_snippets[current_row]
-        new_snippet = snippet_to_copy.copy()
-        self._add_snippet_instance(new_snippet)
-        self._renumber_snippets()
+        count = apply_replacements(message_box.changes)
+        changes = [(change['snippet'], change['path'], change['old'], change['new'])
+                   for change in message_box.changes if change['new'] != change['old']]
+        self.undo_stack.push(SetPropertiesCommand('Replace all', changes, on_changed=self._on_snippets_replaced))
+        self._on_snippets_replaced()
+        InfoBar.success(
+            title='Replaced',
+            content=f'{count} matches replaced',
+            position=InfoBarPosition.TOP,
+            duration=3000,
+            parent=self
+        )
 
-    def _on_save_clicked(self) -> None:
+    def _on_snippets_replaced(self) -> None:
+        self._show_selection()
+        self._search_panel.search()
+
+    def _get_save_path(self, caption: str) -> str:
         file_path, _ = QFileDialog.getSaveFileName(
             self,
-            "Save your story",
+            caption,
             "",
-            "Sekai Story File (*.sekai-story.json)"
+            "Sekai Story Package (*.sekai-story.zip)" if self.export_options.package
+            else "Sekai Story File (*.sekai-story.json)"
+        )
+        return file_path
+
+    @staticmethod
+    def _export_job_key(kind: str, file_path: str, options: ExportOptions) -> tuple:
+        # Jobs with the same key are merged while queued, so the options are part of what makes them identical.
+        return kind, os.path.normcase(os.path.abspath(file_path)), tuple(sorted(options.to_dict().items()))
+
+    def _exporter_factory(self, file_path: str) \
+            -> tuple[ExportOptions, list[BaseSnippet], Callable[[ExportJob], StoryExporter]]:
+        """
+        Snapshots the story and the export options on the UI thread: the snippets are built here and the worker only
+        sees the built data, so edits made while the job is queued or running do not reach it. Returns the options,
+        the snippets in the order they were built and a function that creates the job's exporter.
+        """
+        options = replace(self.export_options)
+        models = [dict(model) for model in self.meta_data.models]
+        images = [dict(image) for image in self.meta_data.images]
+        snippets = list(self.current_snippets)
+        snippets_data = [snippet.build() for snippet in snippets]
+
+        def create(job: ExportJob) -> StoryExporter:
+            return StoryExporter(file_path, models, images, snippets_data, job.report, options,
+                                 client=self.export_service.client, cancel_event=job.cancel_event)
+
+        return options, snippets, create
+
+    def _on_plan_clicked(self) -> None:
+        file_path = self._get_save_path("Where will you save your story?")
+        if file_path is None or file_path == '':
+            return
+
+        options, _, create_exporter = self._exporter_factory(file_path)
+        signals = JobSignals(self)
+        signals.finished.connect(lambda report: self._on_story_planned(report, file_path))
+        signals.failed.connect(self._on_story_build_failed)
+        self.export_service.submit(
+            self._export_job_key('plan', file_path, options),
+            lambda job: create_exporter(job).plan(),
+            PRIORITY_PLAN,
+            **signals.listen()
         )
 
+        InfoBar.info(
+            title='Estimating',
+            content='Resolving every asset of the story...',
+            position=InfoBarPosition.TOP,
+            duration=3000,
+            parent=self
+        )
+
+    def _on_story_planned(self, report: dict, file_path: str) -> None:
+        MessageBox(f'Export plan for {os.path.basename(file_path)}', format_plan(report), self.window()).exec()
+
+    def _on_save_clicked(self) -> None:
+        file_path = self._get_save_path("Save your story")
+
         if file_path is None or file_path == '':
             return
 
         self.save_message_box = SaveFileMessageBox(self)
 
-        build_thread = BuildStoryThread(
-            file_path,
-            self.meta_data,
-            self.current_snippets,
-            self
+        options, snippets, create_exporter = self._exporter_factory(file_path)
+        signals = JobSignals(self)
+        signals.progress.connect(self.save_message_box.update_progress)
+        signals.finished.connect(self._on_story_built)
+        signals.failed.connect(self._on_story_build_failed)
+        job = self.export_service.submit(
+            self._export_job_key('export', file_path, options),
+            # The snippets travel with the result: a save merged into a queued one gets that job's snapshot.
+            lambda job_: (*create_exporter(job_).run(), snippets),
+            PRIORITY_EXPORT,
+            **signals.listen()
         )
 
-        self.save_message_box.cancelButton.clicked.connect(build_thread.cancel)
+        self.save_message_box.cancelButton.clicked.connect(job.cancel)
         self.save_message_box.show()
 
-        build_thread.built.connect(self._on_story_built)
-        build_thread.start()
+    def _on_export_options_clicked(self) -> None:
+        message_box = ExportOptionsMessageBox(self.export_options, self)
+        if message_box.exec():
+            self.export_options = message_box.apply()
+            self.export_options.save()
+
+    def _on_story_built(self, result: tuple[dict, list[tuple[int, str, str]], list[BaseSnippet]]) -> None:
+        # The exported snippets point at their copies in voices/; that rewrite is an edit like any other. A voice
+        # changed since the export started is the user's newer edit and is kept.
+        _story, voice_updates, snippets = result
+        changes = [(snippets[index], 'data.voice', exported_voice, voice_path)
+                   for index, exported_voice, voice_path in voice_updates
+                   if snippets[index].get_property('data.voice') == exported_voice]
+        for snippet, path, _, new in changes:
+            snippet.set_property(path, new)
+        if changes:
+            self.undo_stack.push(SetPropertiesCommand('Point voices at the export', changes,
+                                                      on_changed=self._show_selection))
 
-    def _on_story_built(self, data: OrderedDict, file_path: str) -> None:
-        with open(file_path, 'w+', encoding='utf-8') as f:
-            data_json = json.dumps(data, indent=2, ensure_ascii=False)
-            f.write(data_json)
         self._property_widget.reset()
-        current_index = self._list_widget.currentRow()
-        if len(self.current_snippets) > 0:
-            self._property_widget.set_snippet(self.current_snippets[current_index], self.meta_data)
-        self.save_message_box.close()
+        self._show_selection()
+        if self.save_message_box is not None:
+            self.save_message_box.close()
+            self.save_message_box = None
+
+    def _on_story_build_failed(self, message: str) -> None:
+        if self.save_message_box is not None:
+            self.save_message_box.close()
+            self.save_message_box = None
+        InfoBar.error(
+            title='Export failed',
+            content=message,
+            position=InfoBarPosition.TOP,
+            duration=-1,
+            parent=self
+        )
 
     def _on_load_clicked(self) -> None:
         file_path, _ = QFileDialog.getOpenFileName(
@@ -478,104 +424,36 @@ class MainView(QFrame):
         if file_path is None or file_path == '':
             return
 
-        base_path = os.path.dirname(file_path)
-
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data_json = json.loads(f.read())
-            models_def = data_json['models']
-            images_def = data_json['images']
-            snippets: list = data_json['snippets']
+        signals = JobSignals(self)
+        signals.finished.connect(self._on_story_loaded)
+        signals.failed.connect(self._on_story_load_failed)
+        self.export_service.submit(
+            ('load', os.path.normcase(os.path.abspath(file_path))),
+            lambda job: load_story(file_path),
+            PRIORITY_INTERACTIVE,
+            **signals.listen()
+        )
 
-        self.current_snippets = []
-        self._list_widget.clear()
-        self._property_widget.reset()
+    def _on_story_loaded(self, story: dict) -> None:
+        # Decoded on a service worker; the view takes the whole story at once.
         self.meta_data.reset_all()
+        for model in story['models']:
+            self.meta_data.add_model_entry(model)
+        for image in story['images']:
+            self.meta_data.add_image(image['name'], image['path'], image['id'])
 
-        for model in models_def:
-            file_name_with_ext = model['model'].split('/')[-1]
-
-            if '.model3.json' in file_name_with_ext:
-                model_name = file_name_with_ext.split('.model3.json')[0]
-            elif '.model.json' in file_name_with_ext:
-                model_name = file_name_with_ext.split('.model.json')[0]
-            elif file_name_with_ext == 'model.json':
-                model_name = 'model'
-            else:
-                raise RuntimeError(f"What is the model name: {file_name_with_ext}")
-
-            normal_scale = model.get("normal_scale")
-            small_scale = model.get("small_scale")
-            anchor = model.get("anchor")
-
-            added_model_data = self.meta_data.add_model(
-                model_name,
-                os.path.join(
-                    base_path,
-                    "models",
-                    model['model']
-                ),
-                True,
-                id_=model['id']
-            )
-
-            if normal_scale is not None:
-                added_model_data['normal_scale'] = normal_scale
-            if small_scale is not None:
-                added_model_data['small_scale'] = small_scale
-            if anchor is not None:
-                added_model_data['anchor'] = anchor
-
-        for image in images_def:
-            image_name = Path(image['image'].split('/')[-1]).stem
-            self.meta_data.add_image(
-                image_name,
-                os.path.join(
-                    base_path,
-                    "images",
-                    image['image']
-                ),
-                image['id']
-            )
-
-        for snippet in snippets:
-            snippet_type = snippet['type']
-            snippet_instance = get_snippet(snippet_type).copy()
-            properties = snippet.copy()
-            del properties['type']
-
-            original_order = list(snippet_instance.properties.keys())
-            new_properties = {}
-
-            for key in original_order:
-                if key in properties:
-                    if isinstance(properties[key], dict) and isinstance(snippet_instance.properties[key], dict):
-                        merged_nested = {**snippet_instance.properties[key], **properties[key]}
-                        new_properties[key] = merged_nested
-                    else:
-                        new_properties[key] = properties[key]
-
-            for key in properties.keys():
-                if key not in original_order:
-                    new_properties[key] = properties[key]
-
-            if snippet_instance.type == 'ChangeLayoutMode':
-                new_properties['data']['mode'] = LayoutModes(new_properties['data']['mode'])
-
-            if "data" in new_properties:
-                data = new_properties['data']
-                if "from" in data:
-                    data['from']['side'] = Sides(data['from']['side'])
-                if "to" in data:
-                    data['to']['side'] = Sides(data['to']['side'])
-                if "moveSpeed" in data:
-                    data['moveSpeed'] = MoveSpeed(data['moveSpeed'])
-                if 'voice' in data:
-                    if data['voice']:
-                        data['voice'] = os.path.abspath(os.path.join(
-                            base_path,
-                            "voices",
-                            data['voice']
-                        )).replace("\\", "/")
-
-            snippet_instance.properties = new_properties
-            self._add_snippet_instance(snippet_instance)
+        # The history refers to the snippets and library entries being replaced.
+        self.undo_stack.clear()
+        self._property_widget.reset()
+        self._snippet_model.set_snippets(story['snippets'])
+        if self.current_snippets:
+            self._select_block(len(self.current_snippets) - 1, 1)
+
+    def _on_story_load_failed(self, message: str) -> None:
+        InfoBar.error(
+            title='Load failed',
+            content=message,
+            position=InfoBarPosition.TOP,
+            duration=-1,
+            parent=self
+        )
@@ -2,7 +2,7 @@ import asyncio
 
 import httpx
 from PySide6.QtCore import QSize, Signal
-from PySide6.QtGui import QGuiApplication, QIcon
+from PySide6.QtGui import QGuiApplication, QIcon, QUndoStack, QShortcut, QKeySequence
 from PySide6.QtWidgets import QSizePolicy
 from httpx_retries import RetryTransport, Retry
 from qasync import asyncSlot
@@ -12,6 +12,7 @@ from qfluentwidgets import FluentWindow, FluentIcon
 import app.resources_rc
 from .components import MySplashScreen
 from .data_model import MetaData
+from .export import ExportService
 from .server import FastAPIServer
 from .views import MainView, DataView
 
@@ -35,9 +36,15 @@ class Window(FluentWindow):
         self.splashScreen.raise_()
 
         self.metadata_model = MetaData()
+        self.export_service = ExportService()
 
-        self.data_view = DataView(self.metadata_model, self.server_host, self)
-        self.main_view = MainView(self.metadata_model, self.server_host, self)
+        # One history for the story and its library, so undo walks back through edits in the order they were made.
+        self.undo_stack = QUndoStack(self)
+        QShortcut(QKeySequence.StandardKey.Undo, self, self.undo_stack.undo)
+        QShortcut(QKeySequence.StandardKey.Redo, self, self.undo_stack.redo)
+
+        self.data_view = DataView(self.metadata_model, self.server_host, self.export_service, self.undo_stack, self)
+        self.main_view = MainView(self.metadata_model, self.server_host, self.export_service, self.undo_stack, self)
 
         self.data_loaded.connect(self.data_view.on_data_loaded)
         self.data_view.model_manage_frame.live2d_preview.webview_loaded.connect(self.on_model_live2d_loaded)
@@ -75,6 +82,7 @@ class Window(FluentWindow):
 
     # noinspection PyPep8Naming
     def closeEvent(self, event):
+        self.export_service.shutdown()
         self.stop_server()
         event.accept()
 